@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""Conversion of large list values: str2iter() against array converters."""
+
+import argparse
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from yaconf import PlainConfig  # noqa: E402
+from yaconf.utils import (iter2str, prefix2array, str2array,  # noqa: E402
+                          str2iter, str2ndarray)
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    numpy = None
+
+
+def traced_size(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        obj = func()
+        return obj, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def cases(size):
+    ints = iter2str(range(size))
+    floats = iter2str(idx / 7.0 for idx in range(size))
+    config = PlainConfig({'weights.w{:d}'.format(idx): str(idx / 7.0)
+                          for idx in range(size)})
+    yield 'str2iter int', lambda: str2iter(ints, conv=int)
+    yield 'str2array q', lambda: str2array(ints, 'q')
+    yield 'str2iter float', lambda: str2iter(floats, conv=float)
+    yield 'str2array d', lambda: str2array(floats)
+    if numpy is not None:
+        yield 'str2ndarray int', lambda: str2ndarray(ints, int)
+        yield 'str2ndarray float', lambda: str2ndarray(floats)
+    yield 'items float', lambda: [float(val) for _, val
+                                  in config.items('weights')]
+    yield 'prefix2array d', lambda: prefix2array(config, 'weights')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--number', type=int, default=5)
+    args = parser.parse_args()
+
+    row = '{:>8} {:<18} {:>10} {:>12}'
+    print(row.format('values', 'converter', 'time', 'memory'))
+    for size in (int(x) for x in args.sizes.split(',')):
+        for name, func in cases(size):
+            seconds = timeit.timeit(func, number=args.number) / args.number
+            memory = traced_size(func)[1]
+            print(row.format(size, name, '{:.2f}ms'.format(seconds * 1e3),
+                             '{:.1f}KiB'.format(memory / 1024.0)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""Memory of PlainConfig storage backends."""
+
+import argparse
+import gc
+import io
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from yaconf import PlainConfig  # noqa: E402
+
+
+def make_dict(size, sections=100):
+    return {'service.sec{:d}.sub{:d}.opt{:d}'.format(idx % sections, idx % 7,
+                                                     idx):
+            'value {:d}'.format(idx) for idx in range(size)}
+
+
+def traced_size(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        obj = func()
+        gc.collect()
+        return obj, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    args = parser.parse_args()
+
+    row = '{:>8} {:>8} {:>12} {:>10} {:>10}'
+    print(row.format('options', 'storage', 'memory', 'per opt', 'get'))
+    for size in (int(x) for x in args.sizes.split(',')):
+        data = make_dict(size)
+        text = ''.join('{} = {}\n'.format(*x) for x in data.items())
+        opts = list(data)[::max(1, size // 1000)]
+        for storage in ('dict', 'compact'):
+            # parsed options are new objects, nothing is shared with data
+            config, memory = traced_size(
+                lambda: PlainConfig(io.StringIO(text), storage=storage))
+
+            def get_all():
+                for opt in opts:
+                    config.get(opt)
+            get = timeit.timeit(get_all, number=5) / 5 / len(opts)
+            print(row.format(size, storage,
+                             '{:.1f}MiB'.format(memory / 2.0 ** 20),
+                             '{:.0f}B'.format(memory / float(size)),
+                             '{:.2f}us'.format(get * 1e6)))
+            del config
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""Prefix lookups of PlainConfig against a linear scan of all options."""
+
+import argparse
+import itertools
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from yaconf import PlainConfig  # noqa: E402
+
+
+def make_config(size, sections=100):
+    return PlainConfig({'sec{:d}.sub{:d}.opt{:d}'.format(idx % sections,
+                                                         idx % 7, idx): 'val'
+                        for idx in range(size)})
+
+
+def linear_items(data, prefix):
+    return [(opt[len(prefix) + 1:], val) for opt, val in data.items()
+            if opt.startswith(prefix + '.')]
+
+
+def linear_sections(data):
+    return [section for section, _ in itertools.groupby(
+        sorted(data), key=lambda x: x.split('.')[0] if '.' in x else None
+    ) if section is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000,200000')
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    row = '{:>8} {:>12} {:>12} {:>12} {:>12} {:>12}'
+    print(row.format('options', 'items', 'items_scan',
+                     'sections', 'sect_scan', 'slice_del'))
+    for size in (int(x) for x in args.sizes.split(',')):
+        config = make_config(size)
+        data = dict(config._data.items())
+
+        def timed(func):
+            return timeit.timeit(func, number=args.number) / args.number
+
+        items = timed(lambda: list(config.items('sec7.sub3')))
+        items_scan = timed(lambda: linear_items(data, 'sec7.sub3'))
+        sections = timed(lambda: list(config.sections()))
+        sections_scan = timed(lambda: linear_sections(data))
+
+        def slice_del():
+            opts = dict(config.items('sec7'))
+            del config['sec7':]
+            config['sec7':] = opts
+        slice_del = timed(slice_del)
+
+        print(row.format(size, *('{:.3f}ms'.format(x * 1000) for x in (
+            items, items_scan, sections, sections_scan, slice_del))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""Cold text parsing of PlainConfig against loading its snapshot."""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from yaconf import PlainConfig  # noqa: E402
+
+
+def write_config(path, size, sections=100):
+    with open(path, 'w') as fileobj:
+        for idx in range(size):
+            fileobj.write('sec{:d}.sub{:d}.opt{:d} = value {:d}\n'.format(
+                idx % sections, idx % 7, idx, idx))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--number', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        row = '{:>8} {:>12} {:>12} {:>12}'
+        print(row.format('options', 'text', 'compile', 'snapshot'))
+        for size in (int(x) for x in args.sizes.split(',')):
+            path = os.path.join(tmp_dir, 'config{:d}.conf'.format(size))
+            write_config(path, size)
+
+            def timed(func):
+                return timeit.timeit(func, number=args.number) / args.number
+
+            text = timed(lambda: PlainConfig.load(path, cache=False))
+            compile_ = timed(lambda: PlainConfig.compile(path))
+            snapshot = timed(lambda: PlainConfig.load(path))
+            print(row.format(size, *('{:.1f}ms'.format(x * 1000)
+                                     for x in (text, compile_, snapshot))))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""Benchmarks of PlainConfig hot paths.
+
+Every case is timed on synthetic configs of the given sizes, the best
+time of several repeats and the peak traced memory are reported. With
+--baseline the results are compared with a stored JSON and the script
+exits with non-zero status when some case got slower than allowed or
+has no baseline yet. --save adds the results to the baseline, keeping
+stored cases which weren't run.
+"""
+
+import argparse
+import copy
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    from configparser import ConfigParser
+except ImportError:
+    from ConfigParser import ConfigParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from yaconf import PlainConfig  # noqa: E402
+from yaconf.utils import str2bool, str2iter  # noqa: E402
+
+
+SECTIONS = 100
+# differences below these are treated as noise
+MIN_DELTA = {'time': 1e-3, 'peak': 16 * 1024}
+
+
+def make_dict(size):
+    return {'sec{:d}.sub{:d}.opt{:d}'.format(idx % SECTIONS, idx % 7, idx):
+            'value {:d}'.format(idx) for idx in range(size)}
+
+
+def make_text(size):
+    return ''.join('{} = {}\n'.format(opt, val)
+                   for opt, val in make_dict(size).items())
+
+
+def make_configparser(size):
+    config = ConfigParser(interpolation=None)
+    sections = {}
+    for opt, val in make_dict(size).items():
+        section, opt = opt.split('.', 1)
+        sections.setdefault(section, {})[opt] = val
+    config.read_dict(sections)
+    return config
+
+
+def make_config(size):
+    config = PlainConfig(make_dict(size))
+    config.update({'flags.opt{:d}'.format(idx): 'on' for idx in range(10)})
+    config.update({'lists.opt{:d}'.format(idx): '1, 2, 3, 4'
+                   for idx in range(10)})
+    return config
+
+
+# options of make_config() read and written by the hot path cases
+HOT_OPTS = ['flags.opt{:d}'.format(idx) for idx in range(10)]
+
+
+def get(config):
+    for _ in range(10000):
+        for opt in HOT_OPTS:
+            config.get(opt)
+
+
+def getitem(config):
+    for _ in range(10000):
+        for opt in HOT_OPTS:
+            config[opt]
+
+
+def set_opts(config):
+    for _ in range(10000):
+        for opt in HOT_OPTS:
+            config.set(opt, 'off')
+
+
+def get_conv(config):
+    for _ in range(1000):
+        for idx in range(10):
+            config.get('flags.opt{:d}'.format(idx), conv=str2bool)
+            config.get('lists.opt{:d}'.format(idx), conv=str2iter)
+
+
+def make_diff(size):
+    config, other = make_config(size), make_config(size)
+    other['sec7.sub0.opt7'] = 'changed'
+    del other['flags.opt0']
+    return config, other
+
+
+def slice_set(config):
+    config['sec7':] = {'opt{:d}'.format(idx): 'val' for idx in range(100)}
+
+
+def slice_delete(config):
+    del config['sec7':]
+
+
+# name: (setup, run, setup before each repeat)
+CASES = {
+    'parse': (make_text,
+              lambda text: PlainConfig(io.StringIO(text)), False),
+    'update_dict': (make_dict, lambda data: PlainConfig(data), False),
+    'update_configparser': (make_configparser,
+                            lambda config: PlainConfig(config), False),
+    'update_configparser_raw': (
+        make_configparser,
+        lambda config: PlainConfig.from_configparser(config), False),
+    'to_configparser': (make_config,
+                        lambda config: config.to_configparser(), False),
+    'update_plain_config': (make_config,
+                            lambda config: PlainConfig(config), False),
+    'get': (make_config, get, False),
+    'getitem': (make_config, getitem, False),
+    'set': (make_config, set_opts, False),
+    'get_conv': (make_config, get_conv, False),
+    'items_prefix': (make_config,
+                     lambda config: list(config.items('sec7.sub3')), False),
+    'sections': (make_config, lambda config: list(config.sections()), False),
+    'slice_get': (make_config,
+                  lambda config: dict(config['sec7':].items()), False),
+    'slice_set': (make_config, slice_set, True),
+    'slice_delete': (make_config, slice_delete, True),
+    'str': (make_config, str, False),
+    'dump': (make_config, lambda config: config.dump(io.StringIO()), False),
+    'eq': (lambda size: (make_config(size), make_config(size)),
+           lambda configs: configs[0] == configs[1], False),
+    'deepcopy': (make_config, copy.deepcopy, False),
+    'diff': (make_diff, lambda configs: configs[0].diff(configs[1]), False),
+}
+
+
+def measure(name, size, repeat):
+    setup, run, fresh = CASES[name]
+    state = setup(size)
+
+    best = None
+    for _ in range(repeat):
+        if fresh:
+            state = setup(size)
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            run(state)
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+
+    if fresh:
+        state = setup(size)
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'time': best, 'peak': peak}
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            failures.append('MISSING {}: not in baseline'.format(key))
+            continue
+        for metric in ('time', 'peak'):
+            limit = max(baseline[key][metric] * (1 + tolerance),
+                        baseline[key][metric] + MIN_DELTA[metric])
+            if result[metric] > limit:
+                msg = 'REGRESSION {}: {} {:.6g} > {:.6g} (baseline {:.6g})'
+                failures.append(msg.format(key, metric, result[metric],
+                                           limit, baseline[key][metric]))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated config sizes, up to 1000000')
+    parser.add_argument('--cases', default=','.join(sorted(CASES)),
+                        help='comma separated case names')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', help='baseline JSON to compare with')
+    parser.add_argument('--save', action='store_true',
+                        help='add results to the baseline instead')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative slowdown (default: 0.5)')
+    args = parser.parse_args()
+
+    results = {}
+    row = '{:<24} {:>9} {:>12} {:>12}'
+    print(row.format('case', 'options', 'time', 'peak'))
+    for name in args.cases.split(','):
+        for size in (int(x) for x in args.sizes.split(',')):
+            result = measure(name, size, args.repeat)
+            results['{}/{:d}'.format(name, size)] = result
+            print(row.format(name, size,
+                             '{:.3f}ms'.format(result['time'] * 1000),
+                             '{:.1f}KiB'.format(result['peak'] / 1024.0)))
+
+    if args.baseline is None:
+        return 0
+    baseline = {}
+    if os.path.exists(args.baseline) or not args.save:
+        with open(args.baseline) as fileobj:
+            baseline = json.load(fileobj)
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as fileobj:
+            json.dump(baseline, fileobj, indent=2, sort_keys=True)
+            fileobj.write('\n')
+        return 0
+
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
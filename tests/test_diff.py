@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# coding: utf-8
+
+import copy
+import random
+import unittest
+
+from yaconf import Conflict, PlainConfig, merge3
+from yaconf.diff import iterdiff
+
+
+class DiffTest(unittest.TestCase):
+
+    def test_diff(self):
+        old = PlainConfig({'a.x': '1', 'a.y': '2', 'b.x': '3', 'c': '4'})
+        new = PlainConfig({'a.x': '1', 'a.y': '5', 'a.z': '6', 'c': '4'})
+        self.assertEqual(old.diff(new), ({'a.z': '6'}, {'b.x': '3'},
+                                         {'a.y': ('2', '5')}))
+        self.assertEqual(old.diff(new, 'a'), ({'z': '6'}, {},
+                                              {'y': ('2', '5')}))
+        self.assertEqual(old['a':].diff(new['a':]), old.diff(new, 'a'))
+        self.assertEqual(list(iterdiff(new, old)),
+                         [('a.y', '5', '2'), ('a.z', '6', None),
+                          ('b.x', None, '3')])
+        self.assertEqual(old.diff(old), ({}, {}, {}))
+
+    def test_diff_random(self):
+        rnd = random.Random(0)
+        base = PlainConfig({'s{:d}.o{:d}'.format(idx % 7, idx): str(idx)
+                            for idx in range(500)})
+        for _ in range(20):
+            configs = [copy.copy(base), copy.copy(base)]
+            for config in configs:
+                for _ in range(30):
+                    opt = 's{:d}.o{:d}'.format(rnd.randint(0, 7),
+                                               rnd.randint(0, 600))
+                    if opt in config and rnd.random() < 0.5:
+                        del config[opt]
+                    else:
+                        config[opt] = str(rnd.random())
+            detached = [PlainConfig(dict(x.items())) for x in configs]
+
+            for prefix in (None, 's1', 's7'):
+                expected = detached[0].diff(detached[1], prefix)
+                self.assertEqual(configs[0].diff(configs[1], prefix),
+                                 expected)
+                added, removed, changed = expected
+                old = dict(detached[0].items(prefix))
+                new = dict(detached[1].items(prefix))
+                self.assertEqual(set(added), set(new) - set(old))
+                self.assertEqual(set(removed), set(old) - set(new))
+                self.assertEqual(changed, {
+                    opt: (old[opt], new[opt]) for opt in set(old) & set(new)
+                    if old[opt] != new[opt]})
+
+    def test_merge3(self):
+        base = PlainConfig({'a': '1', 'b': '2', 'c': '3', 'd': '4',
+                            'e': '5'})
+        ours = PlainConfig({'a': '10', 'b': '2', 'c': '30', 'e': '5',
+                            'f': '6', 'g': '7'}, strict=False)
+        theirs = PlainConfig({'a': '1', 'b': '20', 'c': '31', 'd': '4',
+                              'f': '6', 'g': '8'})
+        merged, conflicts = merge3(base, ours, theirs)
+        self.assertEqual(dict(merged.items()),
+                         {'a': '10', 'b': '20', 'c': '30', 'f': '6',
+                          'g': '7'})
+        self.assertEqual(conflicts, [Conflict('c', '3', '30', '31'),
+                                     Conflict('g', None, '7', '8')])
+        self.assertFalse(merged._strict)
+        self.assertEqual(list(merged.sections()), [])
+
+        merged, conflicts = merge3(base, base, ours)
+        self.assertEqual((merged, conflicts), (ours, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
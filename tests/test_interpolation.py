@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# coding: utf-8
+
+import unittest
+
+from yaconf import InterpolationError, PlainConfig
+from yaconf.interpolation import compile_value
+
+
+class InterpolationTest(unittest.TestCase):
+
+    def test_compile_value(self):
+        self.assertEqual(compile_value('plain'), ['plain'])
+        self.assertEqual(compile_value('${a}/${b.c}x'),
+                         ['', 'a', '/', 'b.c', 'x'])
+        self.assertEqual(compile_value('$${a} $$ $ ${a'),
+                         ['${a} $ $ ${a'])
+
+    def test_resolve(self):
+        config = PlainConfig({'db.host': 'localhost', 'db.port': '5432',
+                              'db.url': 'pg://${db.host}:${db.port}',
+                              'app.db': '${db.url}/app', 'app.empty': '',
+                              'app.ref': '[${app.empty}]',
+                              'app.raw': '$${db.host}'},
+                             interpolation=True)
+        self.assertEqual(config['app.db'], 'pg://localhost:5432/app')
+        self.assertEqual(config.get('db.port', conv=int), 5432)
+        self.assertEqual(config['app.ref'], '[]')
+        self.assertEqual(config['app.raw'], '${db.host}')
+        self.assertEqual(dict(config['app':].items())['db'],
+                         'pg://localhost:5432/app')
+        self.assertEqual(PlainConfig(config)['app.db'], '${db.url}/app')
+
+        config['db.host'] = 'remote'
+        self.assertEqual(config['app.db'], 'pg://remote:5432/app')
+        config.update({'db.port': '${app.port}', 'app.port': '1'})
+        self.assertEqual(config.get('db.url'), 'pg://remote:1')
+        config['app.db'] = 'static'
+        config['db.host'] = 'other'
+        self.assertEqual(config['app.db'], 'static')
+        self.assertEqual(config['db.url'], 'pg://other:1')
+
+        del config['app.port']
+        with self.assertRaises(InterpolationError):
+            config['db.url']
+        config['db':] = {'host': 'h', 'port': '2', 'url': '${db.host}:2'}
+        self.assertEqual(config['db.url'], 'h:2')
+
+    def test_cycle(self):
+        config = PlainConfig({'a': '${b}', 'b': 'x${c}', 'c': '${a}',
+                              'd': '${d}', 'e': '${a}'}, interpolation=True)
+        for opt in ('a', 'd', 'e'):
+            with self.assertRaises(InterpolationError):
+                config.get(opt)
+        config['c'] = 'c'
+        self.assertEqual(config['e'], 'xc')
+
+    def test_deep_chain(self):
+        size = 20000
+        data = {'opt{:d}'.format(idx): '${{opt{:d}}}'.format(idx + 1)
+                for idx in range(size)}
+        data['opt{:d}'.format(size)] = 'end'
+        config = PlainConfig(data, interpolation=True)
+        self.assertEqual(config['opt0'], 'end')
+        config['opt{:d}'.format(size)] = 'new'
+        self.assertEqual(config['opt0'], 'new')
+        self.assertEqual(config['opt{:d}'.format(size // 2)], 'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
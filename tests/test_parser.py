@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# coding: utf-8
+
+import io
+import random
+import tempfile
+import unittest
+
+from yaconf import PlainConfig, ParsingError, iterparse
+from yaconf.parser import parse, parse_regex
+
+
+class ParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.texts = [
+            'base = x\n\nbase.opt0 = y\nbase.opt1 = 123\n',
+            '\nopt0 =\n\nopt1 = \n  line_1  \n\nline_3\n\nopt2 = line_0\n'
+            '\nline_2',
+            '# comment = value\n  # comment\nopt = a = b\n\tnext\t\n',
+            'opt = 1\r\nsub.opt=\t2  \r\n  \x0b\n',
+            'opt = val\n # comment\n   \n cont # not comment \n',
+            'base = val\n.opt = 123\n',
+            'base = val\nopt. = 123\n = empty\n',
+            'value without option\nopt = 1\nopt = 2\n',
+            'opt = 1\n\nopt = 2\n  tail',
+        ]
+
+    def assertSameParse(self, text, strict=True, block_size=None):
+        expected = error = None
+        try:
+            expected = parse_regex(io.StringIO(text), strict)
+        except ParsingError as e:
+            error = str(e)
+
+        kwargs = {} if block_size is None else {'block_size': block_size}
+        if error is None:
+            self.assertEqual(parse(io.StringIO(text), strict, **kwargs),
+                             expected)
+        else:
+            with self.assertRaises(ParsingError) as ctx:
+                parse(io.StringIO(text), strict, **kwargs)
+            self.assertEqual(str(ctx.exception), error)
+
+    def test_equivalence(self):
+        for text in self.texts:
+            for strict in (True, False):
+                for block_size in (None, 1, 3, 7):
+                    self.assertSameParse(text, strict, block_size)
+
+    def test_random_equivalence(self):
+        rnd = random.Random(0)
+        parts = ['opt', 'sec.opt', '.', '=', ' ', '\t', '#', 'val', '\n',
+                 '\n', '\n', 'x.y = z\n', '# c\n']
+        for _ in range(500):
+            text = ''.join(rnd.choice(parts) for _ in range(30))
+            self.assertSameParse(text, rnd.random() < 0.5,
+                                 rnd.choice([None, 2, 5]))
+
+    def test_iterparse(self):
+        text = self.texts[1] + '\nsec.a = 1\nsec.b.c = 2\n  3\nsecx = 4\n'
+        self.assertEqual(list(iterparse(io.StringIO(text), block_size=4)),
+                         [(2, 'opt0', ''), (4, 'opt1', '\nline_1\nline_3'),
+                          (9, 'opt2', 'line_0\nline_2'), (12, 'sec.a', '1'),
+                          (13, 'sec.b.c', '2\n3'), (15, 'secx', '4')])
+        self.assertEqual(list(iterparse(io.StringIO(text), prefix='sec')),
+                         [(12, 'sec.a', '1'), (13, 'sec.b.c', '2\n3')])
+
+        with tempfile.NamedTemporaryFile(mode='w+') as fileobj:
+            fileobj.write(text)
+            fileobj.flush()
+            self.assertEqual(list(iterparse(fileobj.name, prefix='sec.b')),
+                             [(13, 'sec.b.c', '2\n3')])
+
+        options = iterparse(io.StringIO(self.texts[5]))
+        self.assertEqual(next(options), (1, 'base', 'val'))
+        with self.assertRaises(ParsingError) as ctx:
+            next(options)
+        self.assertEqual(str(ctx.exception), '2: invalid option name: .opt')
+
+    def test_config_parser(self):
+        text = ''.join(self.texts[:3])
+        for parser in ('fast', 'regex'):
+            config = PlainConfig(io.StringIO(text), parser=parser)
+            self.assertEqual(dict(config.items()),
+                             parse_regex(io.StringIO(text)))
+            self.assertEqual(config['sub':].materialize()._parser, parser)
+
+
+if __name__ == '__main__':
+    unittest.main()
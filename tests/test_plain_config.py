@@ -1,18 +1,35 @@
 #!/usr/bin/python
 # coding: utf-8
 
+import array
+import asyncio
 import copy
+import io
+import os
+import shutil
 import tempfile
+import threading
 import unittest
 from collections import Counter, namedtuple
+from unittest import mock
 
 try:
     from configparser import ConfigParser, DEFAULTSECT
 except ImportError:
     from ConfigParser import ConfigParser, DEFAULTSECT
 
-from yaconf import PlainConfig, ParsingError
+from yaconf import PlainConfig, PlainConfigView, Error, ParsingError
+from yaconf import plain_config
+from yaconf.cache import SOURCE_CACHE, SourceCache
+from yaconf.stats import ConfigStats
+from yaconf.storage import CompactTable
 from yaconf.utils import bool2str, str2bool, iter2str, str2iter
+from yaconf.utils import prefix2array, str2array, str2ndarray
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from yaconf.utils import ON_OFF, YES_NO, TRUE_FALSE, ONE_ZERO
 
 
@@ -50,6 +67,19 @@ class PlainConfigTest(unittest.TestCase):
         self.assertEqual(config.get('bad_opt', default=123), 123)
         self.assertEqual(config.get('bad_opt', 'pos_arg'), 'pos_arg')
 
+        self.assertEqual(config.set('set_opt', 1, conv=int), 1)
+        self.assertEqual(config.get('set_opt'), '1')
+        self.assertEqual(config['set_opt'], '1')
+        self.assertEqual(config.get('set_opt', conv=int), 1)
+        config.set('set_opt', '2')
+        self.assertEqual(config.get('set_opt', conv=int), 2)
+
+        fingerprint = config.fingerprint()
+        config.set('set_opt', '1')
+        self.assertNotEqual(config.fingerprint(), fingerprint)
+        self.assertEqual(config.fingerprint(),
+                         PlainConfig({'set_opt': '1'}).fingerprint())
+
     def test_setitem_getitem(self):
         config = PlainConfig()
 
@@ -72,6 +102,30 @@ class PlainConfigTest(unittest.TestCase):
         config = PlainConfig(data)
         self.assertEqual(Counter(config.sections()), Counter(['sec0', 'sec1']))
 
+    def test_prefix_index(self):
+        data = {'opt': '0', 'opt-x.a': '1', 'opt.a': '2', 'opt.b.c': '3',
+                'opt/x.a': '4', 'opta.b': '5', 'z': '6'}
+        config = PlainConfig(data)
+        self.assertEqual(list(config.sections()),
+                         ['opt-x', 'opt', 'opt/x', 'opta'])
+        self.assertEqual(list(config.items('opt')),
+                         [('a', '2'), ('b.c', '3')])
+        self.assertEqual(list(config.items('opt.b')), [('c', '3')])
+
+        config['opt.0'] = 'new'
+        self.assertEqual(list(config.items('opt'))[0], ('0', 'new'))
+
+        del config['opt':]
+        self.assertEqual(list(config.items('opt')), [])
+        self.assertEqual(list(config.sections()), ['opt-x', 'opt/x', 'opta'])
+        self.assertEqual(len(config), 5)
+
+        del config['opt-x.a']
+        config.update({'sec{:d}.opt'.format(idx): str(idx)
+                       for idx in range(100)})
+        self.assertEqual(len(list(config.sections())), 102)
+        self.assertEqual(str(config).splitlines()[0], 'opt = 0')
+
     def test_subconfig(self):
         data = {'opt': '0', 'base.opt': '1', 'sub.opt0': '2', 'sub.opt1': '3'}
         config = PlainConfig(data)
@@ -80,6 +134,186 @@ class PlainConfigTest(unittest.TestCase):
                          Counter(config.items('sub')))
         self.assertEqual(len(config.subconfig('null')), 0)
 
+    def test_view(self):
+        data = {'opt': '0', 'db.host': 'x', 'db.pool.size': '4',
+                'db.pool.timeout': '10', 'dbx.opt': '1'}
+        config = PlainConfig(data)
+        view = config['db':]
+        self.assertIsInstance(view, PlainConfigView)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(Counter(view), Counter(['host', 'pool.size',
+                                                 'pool.timeout']))
+        self.assertEqual(list(view.sections()), ['pool'])
+        self.assertTrue('pool.size' in view)
+        self.assertFalse('opt' in view)
+        self.assertEqual(view.get('pool.size', conv=int), 4)
+        self.assertEqual(view.get('bad', 'def'), 'def')
+
+        pool = view['pool':]
+        self.assertEqual(pool.prefix, 'db.pool')
+        self.assertEqual(dict(pool.items()), {'size': '4', 'timeout': '10'})
+        pool['size'] = 8
+        self.assertEqual(config['db.pool.size'], '8')
+        config['db.pool.new'] = 'y'
+        self.assertEqual(pool['new'], 'y')
+        self.assertEqual(dict(view.items('pool')), dict(pool.items()))
+
+        view.update({'port': 5432})
+        self.assertEqual(config['db.port'], '5432')
+        with self.assertRaises(ParsingError):
+            view.update({'.bad': 'val'})
+
+        detached = pool.materialize()
+        self.assertIs(type(detached), PlainConfig)
+        self.assertEqual(detached, pool)
+        del pool['new']
+        self.assertFalse('db.pool.new' in config)
+        self.assertTrue('new' in detached)
+
+        view['pool':] = {'max': '1'}
+        self.assertEqual(dict(config.items('db.pool')), {'max': '1'})
+        del view['pool':]
+        self.assertFalse(pool)
+        self.assertEqual(Counter(PlainConfig(view).items()),
+                         Counter({'host': 'x', 'port': '5432'}.items()))
+        self.assertEqual(copy.deepcopy(view), view.materialize())
+
+    def test_view_api(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'db.conf')
+        with open(path, 'w') as fileobj:
+            fileobj.write('main.user = u\n')
+
+        stats = ConfigStats()
+        config = PlainConfig({'opt': '0', 'db.main.host': 'x',
+                              'db.main.port': '1', 'db.replica.host': 'y'},
+                             stats=stats)
+        view = config['db':]
+        tested = set()
+
+        for name in ('load', 'attach', 'aload', 'from_configparser'):
+            with self.assertRaises(Error):
+                getattr(view, name)(path)
+            tested.add(name)
+
+        snapshot = view.compile(path, cache_dir=tmp_dir)
+        self.assertTrue(os.path.exists(snapshot))
+        tested.add('compile')
+
+        export_path = os.path.join(tmp_dir, 'db.yac')
+        view.export(export_path)
+        self.assertEqual(PlainConfig.attach(export_path), view)
+        fileobj = io.StringIO()
+        view.dump(fileobj, prefix='replica')
+        self.assertEqual(fileobj.getvalue(), 'host = y\n')
+        parser = view.to_configparser()
+        self.assertEqual(parser.get('main', 'port'), '1')
+        tested.update(['export', 'dump', 'to_configparser'])
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.run_until_complete(view.aupdate(path))
+        self.assertEqual(config['db.main.user'], 'u')
+        view.update({'main.port': '2'})
+        self.assertEqual(view.set('main.host', 'z'), 'z')
+        self.assertEqual(config['db.main.host'], 'z')
+        with view.batch():
+            view['replica.port'] = '3'
+            self.assertEqual(view['replica.port'], '3')
+            self.assertEqual(len(view), 5)
+        self.assertEqual(config['db.replica.port'], '3')
+        tested.update(['aupdate', 'update', 'set', 'batch'])
+
+        self.assertIs(view.stats, stats)
+        with self.assertRaises(Error):
+            view.stats = None
+        self.assertEqual(view.get('main.port', conv=int), 2)
+        self.assertEqual(view.conv_cache_info(), config.conv_cache_info())
+        self.assertEqual(list(view.sections()), ['main', 'replica'])
+        self.assertEqual(dict(view.items('replica')),
+                         {'host': 'y', 'port': '3'})
+        self.assertEqual(view.subconfig('main').prefix, 'db.main')
+        self.assertEqual(view.fingerprint(),
+                         view.materialize().fingerprint())
+        tested.update(['stats', 'get', 'conv_cache_info', 'sections',
+                       'items', 'subconfig', 'fingerprint'])
+
+        other = view.overlay({'main.port': '4'})
+        self.assertEqual(config['db.main.port'], '2')
+        self.assertEqual(view.diff(other).changed, {'main.port': ('2', '4')})
+        tested.update(['overlay', 'diff'])
+
+        view._merge({'new': '1'})
+        view._invalidate(['new'])
+        self.assertEqual(config['db.new'], '1')
+
+        public = set(x for x in dir(PlainConfig) if not x.startswith('_'))
+        self.assertEqual(tested, public)
+
+    def test_overlay(self):
+        base_data = {'opt': '0', 'a.x': '1', 'a.y': '2', 'b.x': '3',
+                     'b-c.x': '4', 'c.x': '5'}
+        base = PlainConfig(base_data)
+        config = base.overlay({'a.x': 'new', 'd.x': '6'}, {'opt': 'top'})
+
+        data = dict(base_data, **{'a.x': 'new', 'd.x': '6', 'opt': 'top'})
+        self.assertEqual(dict(config.items()), data)
+        self.assertEqual(dict(base.items()), base_data)
+        self.assertEqual(len(config), 7)
+
+        del config['b':]
+        del config['c.x']
+        config['a.z'] = '7'
+        for opt in ('b.x', 'c.x'):
+            del data[opt]
+        data['a.z'] = '7'
+        self.assertEqual(dict(config.items()), data)
+        self.assertEqual(len(config), 6)
+        self.assertEqual(list(config.sections()), ['a', 'b-c', 'd'])
+        self.assertEqual(list(base.sections()), ['a', 'b-c', 'b', 'c'])
+        self.assertEqual(list(config.items('a')),
+                         [('x', 'new'), ('y', '2'), ('z', '7')])
+        self.assertEqual(len(config['a':]), 3)
+        self.assertFalse('b.x' in config)
+        self.assertEqual(config, PlainConfig(data))
+
+        config['c.x'] = '5'
+        self.assertEqual(list(config.sections()), ['a', 'b-c', 'c', 'd'])
+        base['a.y'] = 'base'
+        self.assertEqual(config['a.y'], '2')
+        self.assertEqual(len(base), 6)
+
+        view = base['a':].overlay({'x': 'view'})
+        self.assertIs(type(view), PlainConfig)
+        self.assertEqual(dict(view.items()), {'x': 'view', 'y': 'base'})
+        self.assertEqual(base['a.x'], '1')
+
+    def test_copy(self):
+        config = PlainConfig({'opt': '0', 'sec.opt': '1'})
+        self.assertEqual(config.get('opt', conv=int), 0)
+        shallow = copy.copy(config)
+        self.assertEqual(shallow, config)
+
+        shallow['sec.opt'] = '2'
+        config['opt'] = '1'
+        del shallow['opt']
+        self.assertEqual(dict(config.items()), {'opt': '1', 'sec.opt': '1'})
+        self.assertEqual(dict(shallow.items()), {'sec.opt': '2'})
+        self.assertEqual(config.get('opt', conv=int), 1)
+
+        shallow.update(copy.copy(shallow))
+        copy.copy(shallow)['new'] = 'val'
+        self.assertEqual(dict(shallow.items()), {'sec.opt': '2'})
+
+        config = PlainConfig({'opt': '0', 'sec.opt': '1'})
+        data = config._data
+        shallow = copy.copy(config)
+        self.assertIs(config._data, data)
+        config['sec.opt'] = '2'
+        self.assertEqual(shallow['sec.opt'], '1')
+        self.assertEqual(dict(data.items()), {'opt': '0', 'sec.opt': '1'})
+
     def test_bool(self):
         config = PlainConfig()
         self.assertFalse(bool(config))
@@ -134,6 +368,124 @@ class PlainConfigTest(unittest.TestCase):
             [1, 2, 3]
         )
 
+    def test_array_converters(self):
+        config = PlainConfig({'shards': iter2str(range(5)),
+                              'weights': '0.5, 1.5, 2.5  3',
+                              'w.b': '2', 'w.a': '-1', 'w.c.d': '3e2',
+                              'n.a': '1', 'n.b': '2', 'bad.a': '1',
+                              'bad.b': '1 2'})
+        shards = config.get('shards', conv=str2array)
+        self.assertEqual(shards, array.array('d', range(5)))
+        self.assertEqual(str2array(config['shards'], 'q'),
+                         array.array('q', str2iter(config['shards'],
+                                                   conv=int)))
+        self.assertEqual(list(str2array(config['weights'])),
+                         str2iter(config['weights'], conv=float))
+        self.assertEqual(str2array(''), array.array('d'))
+        with self.assertRaises(ValueError):
+            str2array('1.5', 'i')
+
+        opts, values = prefix2array(config, 'w')
+        self.assertEqual(opts, ['a', 'b', 'c.d'])
+        self.assertEqual(values, array.array('d', [-1, 2, 300]))
+        self.assertEqual(prefix2array(config['w':], 'c'),
+                         (['d'], array.array('d', [300])))
+        self.assertEqual(prefix2array(config, 'none'), ([], array.array('d')))
+        self.assertEqual(prefix2array(config, 'n', 'q'),
+                         (['a', 'b'], array.array('q', [1, 2])))
+        for prefix, typecode in (('bad', 'd'), ('w', 'q')):
+            with self.assertRaises(ValueError):
+                prefix2array(config, prefix, typecode)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ndarray_converters(self):
+        config = PlainConfig({'shards': '1, 2, 3', 'w.a': '0.5', 'w.b': '2'})
+        shards = config.get('shards', conv=str2ndarray)
+        self.assertEqual(shards.tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(str2ndarray(config['shards'], int).tolist(),
+                         [1, 2, 3])
+        opts, values = prefix2array(config, 'w')
+        self.assertEqual((opts, numpy.asarray(values).tolist()),
+                         (['a', 'b'], [0.5, 2.0]))
+
+    def test_conv_cache(self):
+        config = PlainConfig({'flag': 'on', 'list': '1, 2', 'sub.num': '1'})
+        calls = Counter()
+
+        def to_int(value):
+            calls[value] += 1
+            return int(value)
+
+        for _ in range(3):
+            self.assertTrue(config.get('flag', conv=str2bool))
+            self.assertEqual(config['sub':].get('num', conv=to_int), 1)
+        self.assertEqual(calls['1'], 1)
+        self.assertEqual(config.conv_cache_info(), (4, 2, 2))
+
+        config.set('flag', 'off')
+        self.assertFalse(config.get('flag', conv=str2bool))
+        config['sub.num'] = 2
+        self.assertEqual(config.get('sub.num', conv=to_int), 2)
+        config.update({'sub.num': '3'})
+        self.assertEqual(config.get('sub.num', conv=to_int), 3)
+        del config['sub':]
+        self.assertEqual(config.get('sub.num', 0, conv=to_int), 0)
+        config['sub':] = {'num': 4}
+        self.assertEqual(config.get('sub.num', conv=to_int), 4)
+        self.assertEqual(config.conv_cache_info().hits, 4)
+
+        first = config.get('list', conv=str2iter)
+        first.append('3')
+        self.assertEqual(config.get('list', conv=str2iter), ['1', '2'])
+        self.assertEqual(config.get('list', conv=str2array).tolist(),
+                         [1.0, 2.0])
+        self.assertEqual(config.conv_cache_info().size, 3)
+
+        def to_tuple(value):
+            calls[value] += 1
+            return tuple(str2iter(value, conv=int))
+
+        def to_nested(value):
+            calls[value] += 1
+            return (value, [value])
+
+        for _ in range(2):
+            self.assertEqual(config.get('list', conv=to_tuple), (1, 2))
+            self.assertEqual(config.get('list', conv=to_nested),
+                             ('1, 2', ['1, 2']))
+        self.assertEqual(calls['1, 2'], 3)
+        self.assertEqual(config.conv_cache_info().size, 4)
+
+        info = config.conv_cache_info()
+        for _ in range(2):
+            self.assertEqual(config.get('list', conv=str2array).tolist(),
+                             [1.0, 2.0])
+        self.assertEqual(config.conv_cache_info(), info)
+        self.assertEqual(config.get('list', conv=str2iter), ['1', '2'])
+        self.assertEqual(config.conv_cache_info().hits, info.hits + 1)
+        self.assertEqual(config.get('list', conv=lambda x: {x}), {'1, 2'})
+        self.assertIs(type(config.get('list', conv=lambda x: {x})), set)
+
+        class Unhashable(object):
+            __hash__ = None
+
+            def __call__(self, value):
+                calls['unhashable'] += 1
+                return int(value)
+
+        config = PlainConfig({'num': '1'})
+        for _ in range(2):
+            self.assertEqual(config.get('num', conv=Unhashable()), 1)
+            self.assertEqual(config.get('num', conv=int), 1)
+        self.assertEqual(calls['unhashable'], 2)
+        self.assertEqual(config.conv_cache_info(), (1, 1, 1))
+
+        config = PlainConfig({'num': '1'}, conv_cache=False)
+        config.get('num', conv=to_int)
+        config.get('num', conv=to_int)
+        self.assertEqual(calls['1'], 3)
+        self.assertEqual(config.conv_cache_info(), (0, 0, 0))
+
     def test_items(self):
         config = PlainConfig()
 
@@ -205,6 +557,54 @@ class PlainConfigTest(unittest.TestCase):
         self.assertEqual(Counter(plain_config.items()),
                          Counter(plain_opts.items()))
 
+    def test_configparser(self):
+        raw_config = ConfigParser({'base': '/srv'})
+        raw_config.read_string('[sec0]\n'
+                               'path = %(base)s/x\n'
+                               'opt.sub = multi\n  line\n'
+                               '[sec1]\n'
+                               'base = /opt\n')
+        config = PlainConfig.from_configparser(raw_config)
+        self.assertEqual(dict(config.items()),
+                         {'DEFAULT.base': '/srv', 'sec0.path': '%(base)s/x',
+                          'sec0.opt.sub': 'multi\nline',
+                          'sec1.base': '/opt'})
+        self.assertEqual(PlainConfig(raw_config)['sec0.path'], '/srv/x')
+        self.assertEqual(PlainConfig.from_configparser(
+            raw_config, raw=False), PlainConfig(raw_config))
+
+        exported = config.to_configparser()
+        self.assertEqual(exported.sections(), ['sec0', 'sec1'])
+        self.assertEqual(exported.get('sec0', 'opt.sub'), 'multi\nline')
+        self.assertEqual(exported.get('sec0', 'base'), '/srv')
+        self.assertEqual(PlainConfig.from_configparser(exported), config)
+
+        config['Sec2.Opt'] = '%'
+        self.assertEqual(config.to_configparser().get('Sec2', 'Opt'), '%')
+        config['top'] = '1'
+        with self.assertRaises(Error):
+            config.to_configparser()
+        del config['top']
+
+        config.set('sec1.num', 1, conv=int)
+        self.assertEqual(config.to_configparser().get('sec1', 'num'), '1')
+        with mock.patch.object(plain_config, '_STDLIB_PARSERS', ()):
+            exported = config.to_configparser()
+            self.assertEqual(exported.get('sec1', 'num'), '1')
+            self.assertEqual(
+                dict(PlainConfig.from_configparser(exported).items()),
+                dict(config.items()))
+
+        class Filtered(ConfigParser):
+            def items(self, section=None, raw=False, vars=None):
+                items = super(Filtered, self).items(section, raw, vars)
+                return [x for x in items if x[0] != 'secret']
+
+        filtered = Filtered({'base': '/srv'})
+        filtered.read_string('[sec]\nsecret = x\nopt = %(base)s\n')
+        self.assertEqual(dict(PlainConfig.from_configparser(filtered).items()),
+                         {'DEFAULT.base': '/srv', 'sec.opt': '%(base)s'})
+
     def test_update_file(self):
         opts = {}
         config = PlainConfig()
@@ -297,6 +697,355 @@ class PlainConfigTest(unittest.TestCase):
             config = PlainConfig(data)
             self.assertEqual(Counter(config.items()), Counter(opts.items()))
 
+    def test_source_cache(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        paths = [os.path.join(tmp_dir, name)
+                 for name in ('common.conf', 'a.conf', 'b.conf')]
+        for idx, path in enumerate(paths):
+            with open(path, 'w') as fileobj:
+                fileobj.write('opt = {:d}\nsec.opt{:d} = x\n'.format(idx, idx))
+
+        cache = SourceCache(max_size=2000)
+        config_a = PlainConfig(paths[:2], source_cache=cache)
+        config_b = PlainConfig([paths[0], paths[2]], source_cache=cache)
+        self.assertEqual(dict(config_a.items()),
+                         {'opt': '1', 'sec.opt0': 'x', 'sec.opt1': 'x'})
+        self.assertEqual(config_b['opt'], '2')
+        self.assertEqual(cache.info()[:4], (1, 3, 0, 3))
+        self.assertEqual(copy.deepcopy(config_a)._source_cache, cache)
+
+        config_a['opt'] = 'changed'
+        self.assertEqual(PlainConfig(paths[0], source_cache=cache)['opt'],
+                         '0')
+        self.assertEqual(PlainConfig(os.path.join(tmp_dir, 'missing'),
+                                     source_cache=cache), PlainConfig())
+
+        with open(paths[0], 'a') as fileobj:
+            fileobj.write('new = 1\n')
+        self.assertEqual(PlainConfig(paths[0], source_cache=cache)['new'],
+                         '1')
+        self.assertEqual(cache.info()[:4], (2, 4, 0, 3))
+
+        cache.max_size = 600
+        PlainConfig(paths[1], source_cache=cache, strict=False)
+        self.assertEqual(cache.info()[1:4], (5, 2, 1))
+        self.assertLessEqual(cache.info().size, 600)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIs(PlainConfig(source_cache=True)._source_cache,
+                      SOURCE_CACHE)
+
+    def test_snapshot(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        with tempfile.NamedTemporaryFile(mode='w+') as fileobj:
+            fileobj.write('sec.b = 2\nsec.a = 1\n  cont\n')
+            fileobj.flush()
+            expected = PlainConfig(fileobj.name)
+
+            snapshot = PlainConfig.compile(fileobj.name, cache_dir=cache_dir)
+            self.assertTrue(snapshot.startswith(cache_dir))
+            config = PlainConfig.load(fileobj.name, cache_dir=cache_dir)
+            self.assertEqual(config, expected)
+            self.assertEqual(list(config.items('sec')),
+                             [('a', '1\ncont'), ('b', '2')])
+            self.assertEqual(PlainConfig.load(fileobj.name, cache=False),
+                             expected)
+
+            fileobj.write('sec.c = 3\n')
+            fileobj.flush()
+            config = PlainConfig.load(fileobj.name, cache_dir=cache_dir)
+            self.assertEqual(config['sec.c'], '3')
+            config = PlainConfig.load(fileobj.name, cache_dir=cache_dir,
+                                      strict=False)
+            self.assertEqual(len(config), 3)
+
+            fileobj.write('sec.c = 4\n')
+            fileobj.flush()
+            with self.assertRaises(ParsingError):
+                PlainConfig.load(fileobj.name, cache_dir=cache_dir)
+            config = PlainConfig.load(fileobj.name, cache_dir=cache_dir,
+                                      strict=False)
+            self.assertEqual(config['sec.c'], '4')
+
+        self.assertEqual(len(PlainConfig.load('/bad/path/to/config')), 0)
+
+    def test_ctor_parallel(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        paths = []
+        for idx, case in enumerate(self.cases):
+            paths.append(os.path.join(tmp_dir, '{:d}.conf'.format(idx)))
+            with open(paths[-1], 'w') as fileobj:
+                fileobj.write('\n'.join(case.lines))
+
+        good = [p for p, c in zip(paths, self.cases) if c.error is None]
+        data = good + [{'base': 'dict'}, '/bad/path/to/config'] + good[:1]
+        serial = PlainConfig(data)
+        for processes in (False, True):
+            config = PlainConfig(data, jobs=2, processes=processes)
+            self.assertEqual(config, serial)
+            self.assertEqual(config['base'], 'x')
+
+        with self.assertRaises(ParsingError) as ctx:
+            PlainConfig(paths, jobs=4)
+        self.assertEqual(str(ctx.exception).splitlines(),
+                         ['{}:2: invalid option name: .opt'.format(paths[2]),
+                          '{}:2: invalid option name: opt.'.format(paths[3])])
+
+    def test_aload(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        paths = []
+        for idx, case in enumerate(self.cases):
+            paths.append(os.path.join(tmp_dir, '{:d}.conf'.format(idx)))
+            with open(paths[-1], 'w') as fileobj:
+                fileobj.write('\n'.join(case.lines))
+
+        async def load():
+            stream = asyncio.StreamReader()
+            stream.feed_data('stream.opt = 1\n  two\nbase = s'.encode())
+            stream.feed_eof()
+            fileobj = io.StringIO('file.opt = 2')
+            config = await PlainConfig.aload(
+                [paths[0], stream, {'base.opt0': 'dict'}, fileobj, paths[1]])
+
+            with self.assertRaises(ParsingError):
+                await config.aupdate(paths[2])
+            await config.aupdate('/bad/path/to/config')
+            await config['view':].aupdate([io.StringIO('opt = v'),
+                                           {'dict': 'd'}])
+            return config
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        config = loop.run_until_complete(load())
+        expected = PlainConfig(paths[:2])
+        expected.update({'stream.opt': '1\ntwo', 'base': 's',
+                         'base.opt0': 'dict', 'file.opt': '2',
+                         'view.opt': 'v', 'view.dict': 'd'})
+        self.assertEqual(config, expected)
+
+    def test_stats(self):
+        stats = ConfigStats()
+        config = PlainConfig({'opt': '1', 'sec.opt': '2'}, stats=stats)
+        self.assertIs(config.stats, stats)
+
+        config.get('opt')
+        config['opt']
+        config['sec':]['opt']
+        self.assertEqual(list(config.sections()), ['sec'])
+        config['new':] = {'opt': '3'}
+        del config['new':]
+        config.update(io.StringIO('file.opt = 4\nfile.next = 5\n'))
+        self.assertEqual(stats.hot_options(1), [('opt', 2)])
+        self.assertEqual(stats.reads['sec.opt'], 1)
+        self.assertEqual(sorted(stats.timings),
+                         ['sections', 'slice_delete', 'slice_get',
+                          'slice_set', 'update'])
+        self.assertEqual(stats.timings['update'][0], 2)
+        self.assertEqual(stats.sources[0].source, 'StringIO')
+        self.assertEqual(stats.sources[0][2:], (27, 2))
+        self.assertEqual(copy.deepcopy(config).stats, stats)
+        self.assertEqual(sorted(stats.as_dict()),
+                         ['reads', 'sources', 'timings'])
+
+        with tempfile.NamedTemporaryFile(mode='w+') as fileobj:
+            fileobj.write('path.opt = 6\n')
+            fileobj.flush()
+            config.update(fileobj.name)
+            self.assertEqual(stats.sources[-1][:1] + stats.sources[-1][2:],
+                             (fileobj.name, 13, 1))
+
+        config.stats = None
+        config.get('opt')
+        self.assertEqual(stats.reads['opt'], 2)
+        config.stats = stats
+        config.get('opt')
+        self.assertEqual(stats.reads['opt'], 3)
+
+    def test_attach(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'config.mm')
+
+        data = {'opt': '0', 'sec.a': '\u0444', 'sec.b.c': 'x\ny', 'z.z': ''}
+        PlainConfig(data).export(path)
+        config = PlainConfig.attach(path)
+        self.assertEqual(config, PlainConfig(data))
+        self.assertEqual(config.get('sec.b.c'), 'x\ny')
+        self.assertEqual(list(config.sections()), ['sec', 'z'])
+        self.assertEqual(dict(config['sec':].items()),
+                         {'a': '\u0444', 'b.c': 'x\ny'})
+        self.assertFalse('sec.b' in config)
+        with self.assertRaises(Error):
+            config['opt'] = '1'
+        with self.assertRaises(Error):
+            del config['sec':]
+        self.assertEqual(copy.deepcopy(config), config)
+        self.assertIs(copy.copy(config)._data, config._data)
+
+        writable = PlainConfig.attach(path, writable=True)
+        writable['opt'] = '1'
+        del writable['sec':]
+        self.assertEqual(dict(writable.items()), {'opt': '1', 'z.z': ''})
+        self.assertEqual(config['opt'], '0')
+
+        writable.export(path)
+        self.assertEqual(PlainConfig.attach(path), writable)
+        self.assertEqual(config['sec.a'], '\u0444')
+
+        config = PlainConfig({'a': '0'})
+        config.set('b', 1, conv=int)
+        config.export(path)
+        self.assertEqual(dict(PlainConfig.attach(path).items()),
+                         {'a': '0', 'b': '1'})
+
+    def test_batch(self):
+        stats = ConfigStats()
+        config = PlainConfig({'sec.a': '1', 'sec.b': '2', 'opt': 'on'},
+                             stats=stats)
+        self.assertEqual(config.get('sec.a', conv=int), 1)
+        data = config._data
+        with config.batch():
+            config['sec.a'] = '10'
+            self.assertEqual(config.get('sec.a', conv=int), 10)
+            del config['sec.b']
+            config['new.opt'] = 'x'
+            del config['new.opt']
+            config['new.opt'] = 'x'
+            with config.batch():
+                config['sec':] = {'c': '3', 'a': '11'}
+            self.assertEqual(len(config), 4)
+            self.assertTrue('new.opt' in config)
+            self.assertEqual(config['sec.a'], '11')
+            self.assertEqual(len(config['sec':]), 2)
+            self.assertEqual(config._storage, data)
+            inner = copy.copy(config)
+        self.assertIsNot(config._data, data)
+        self.assertEqual(len(data), 3)
+        self.assertEqual(dict(data.items()),
+                         {'sec.a': '1', 'sec.b': '2', 'opt': 'on'})
+        self.assertEqual(inner, config)
+        inner['late'] = '1'
+        self.assertFalse('late' in config)
+        self.assertEqual(dict(config.items()),
+                         {'sec.a': '11', 'sec.c': '3', 'opt': 'on',
+                          'new.opt': 'x'})
+        self.assertEqual(config.get('sec.a', conv=int), 11)
+        self.assertEqual(list(config.sections()), ['new', 'sec'])
+        self.assertEqual(stats.timings['batch'][0], 1)
+
+        expected = copy.deepcopy(config)
+        with self.assertRaises(ParsingError):
+            with config.batch():
+                del config['sec':]
+                config['opt'] = 'off'
+                config.update({'valid': '1', '.invalid': '2'})
+        self.assertEqual(config, expected)
+        self.assertEqual(config.get('sec.a', conv=int), 11)
+
+        view = config['sec':]
+        with view.batch() as batch:
+            self.assertIs(batch, view)
+            view['a'] = '12'
+            del view['c']
+            self.assertEqual(view['a'], '12')
+            self.assertEqual(config['sec.a'], '12')
+            self.assertFalse('c' in view)
+        self.assertEqual(dict(view.items()), {'a': '12'})
+
+        config = PlainConfig({'a': '1', 'b': '${a}'}, interpolation=True)
+        self.assertEqual(config['b'], '1')
+        with config.batch():
+            config['a'] = '2'
+            self.assertEqual(config['b'], '2')
+            config['a'] = '3'
+            self.assertEqual(config['b'], '3')
+        self.assertEqual(config['b'], '3')
+
+        config = PlainConfig({'a': '1', 'b': '1'})
+        started, written = threading.Event(), threading.Event()
+        seen = []
+
+        def write():
+            started.wait()
+            config['b'] = '2'
+            seen.append(config['a'])
+            written.set()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        with config.batch():
+            config['a'] = '2'
+            started.set()
+            written.wait(10)
+            self.assertEqual(seen, ['1'])
+            self.assertEqual(config['a'], '2')
+            self.assertEqual(config['b'], '1')
+            self.assertEqual(config._storage['b'], '2')
+        thread.join()
+        self.assertEqual(dict(config.items()), {'a': '2', 'b': '2'})
+
+        config = PlainConfig({'a': '1'})
+        readonly = PlainConfig(storage='compact')
+        readonly._data = CompactTable.from_items(config._data.items())
+        with self.assertRaises(Error):
+            with readonly.batch():
+                readonly['a'] = '2'
+        self.assertEqual(readonly['a'], '1')
+
+        data = {'opt{:d}'.format(idx): str(idx) for idx in range(100)}
+        config = PlainConfig(data)
+        with config.batch():
+            for idx in range(0, 100, 2):
+                del config['opt{:d}'.format(idx)]
+        self.assertEqual(list(config._data.keys()),
+                         sorted(x for x in data if int(x[3:]) % 2))
+
+    def test_dump(self):
+        data = {'opt': '0', 'sec.a': '\u0444', 'sec.b.c': 'x = 1\ny\nz',
+                'sec.d': '\nlast', 'z.z': '', '#x': 'a  b'}
+        config = PlainConfig(data)
+        fileobj = io.StringIO()
+        config.dump(fileobj)
+        self.assertEqual(fileobj.getvalue().splitlines()[:4],
+                         ['#x = a  b', 'opt = 0', 'sec.a = \u0444',
+                          'sec.b.c = x = 1'])
+        fileobj.seek(0)
+        self.assertEqual(PlainConfig(fileobj), config)
+
+        fileobj = io.StringIO()
+        config['sec':].dump(fileobj, prefix='b')
+        self.assertEqual(fileobj.getvalue(), 'c = x = 1\n    y\n    z\n')
+
+        fileobj = io.StringIO()
+        config.dump(fileobj, sort=False)
+        fileobj.seek(0)
+        self.assertEqual(PlainConfig(fileobj), config)
+
+        config = PlainConfig({'sec.b': '2'})
+        config.set('sec.a', 1, conv=int)
+        config.set('sec.c', 1.5, conv=float)
+        fileobj = io.StringIO()
+        config.dump(fileobj)
+        self.assertEqual(fileobj.getvalue(),
+                         'sec.a = 1\nsec.b = 2\nsec.c = 1.5\n')
+        fileobj = io.StringIO()
+        config.dump(fileobj, sort=False)
+        fileobj.seek(0)
+        self.assertEqual(dict(PlainConfig(fileobj).items()),
+                         dict(config.items()))
+
+        for opt, value in (('a', ' x'), ('a', 'x\n\ny'), ('a', 'x\n#y'),
+                           ('a', 'x\ny = 1'), ('a', 'x\r'), ('a=b', 'x'),
+                           (' a', 'x')):
+            with self.assertRaises(Error):
+                PlainConfig({opt: value}).dump(io.StringIO())
+
     def test_contains(self):
         config = PlainConfig({'opt0': 'test', 'opt1': 123})
         self.assertTrue('opt0' in config)
@@ -0,0 +1,147 @@
+#!/usr/bin/python
+# coding: utf-8
+
+import asyncio
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+from yaconf import ParsingError, ReloadableConfig
+
+
+class ReloadableConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.mtime = 1000000000
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as fileobj:
+            fileobj.write(text)
+        # same size rewrites must be noticed even within one mtime tick
+        self.mtime += 1
+        os.utime(path, (self.mtime, self.mtime))
+        return path
+
+    def test_reload(self):
+        common = self.write('common.conf', 'db.host = a\ndb.port = 1\n')
+        local = self.write('local.conf', 'db.port = 2\nweb.opt = x\n')
+        missing = os.path.join(self.tmp_dir, 'missing.conf')
+        config = ReloadableConfig([common, {'web.flag': 'on'}, local,
+                                   missing])
+        self.assertEqual(config.get('db.port', conv=int), 2)
+        config['manual'] = 'keep'
+
+        events, db_events = [], []
+        config.subscribe(events.append)
+        config.subscribe(db_events.append, prefix='db')
+        self.assertEqual(config.reload(), (set(), set(), set()))
+
+        old_data = config._data
+        self.write('common.conf', 'db.host = b\ndb.port = 1\ndb.new = 1\n')
+        self.write('local.conf', 'db.port = 2\n')
+        changes = config.reload()
+        self.assertEqual(changes, ({'db.new'}, {'db.host'}, {'web.opt'}))
+        self.assertEqual(events, [changes])
+        self.assertEqual(db_events, [({'db.new'}, {'db.host'}, set())])
+        self.assertEqual(dict(config.items()),
+                         {'db.host': 'b', 'db.port': '2', 'db.new': '1',
+                          'web.flag': 'on', 'manual': 'keep'})
+        self.assertEqual(old_data.get('db.host'), 'a')
+        self.assertEqual(config.get('db.port', conv=int), 2)
+
+        self.write('missing.conf', 'db.port = 3\n')
+        config.unsubscribe(events.append)
+        self.assertEqual(config.reload(), (set(), {'db.port'}, set()))
+        self.assertEqual(config.get('db.port', conv=int), 3)
+        self.assertEqual(len(events), 1)
+
+        os.remove(missing)
+        self.assertEqual(config.reload(), (set(), {'db.port'}, set()))
+        self.assertEqual(config['db.port'], '2')
+
+    def test_copy(self):
+        path = self.write('config.conf', 'opt = 1\n')
+        config = ReloadableConfig(path)
+        events = []
+        config.subscribe(events.append)
+
+        shallow, deep = copy.copy(config), copy.deepcopy(config)
+        overlay = config.overlay({'top': '1'})
+        copies = [shallow, deep, overlay]
+        for obj in copies:
+            self.assertIsNot(obj._reload_lock, config._reload_lock)
+            self.assertEqual(obj._subscribers, [])
+            self.assertFalse(set(map(id, obj._sources)) &
+                             set(map(id, config._sources)))
+        self.assertEqual(len(overlay._sources), 2)
+        self.assertEqual(len(config._sources), 1)
+
+        self.write('config.conf', 'opt = 2\n')
+        for obj in [config] + copies:
+            self.assertEqual(obj.reload().changed, {'opt'})
+            self.assertEqual(obj['opt'], '2')
+        self.assertEqual(len(events), 1)
+        self.assertEqual(overlay['top'], '1')
+
+    def test_reload_race(self):
+        for interpolation in (False, True):
+            path = self.write('config.conf', 'opt = 1\nref = ${opt}\n')
+            config = ReloadableConfig(path, interpolation=interpolation)
+
+            def reload_int(value):
+                # the options are replaced while get() converts the old value
+                self.write('config.conf', 'opt = 2\nref = ${opt}\n')
+                config.reload()
+                return int(value)
+
+            opt = 'ref' if interpolation else 'opt'
+            self.assertEqual(config.get(opt, conv=reload_int), 1)
+            self.assertEqual(config.get(opt, conv=reload_int), 2)
+            self.assertEqual(config.get(opt, conv=int), 2)
+
+    def test_aupdate(self):
+        path = self.write('config.conf', 'opt = 1\n')
+        config = ReloadableConfig()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.run_until_complete(config.aupdate([path, {'dict': '1'}]))
+        self.assertEqual(dict(config.items()), {'opt': '1', 'dict': '1'})
+
+        self.write('config.conf', 'opt = 2\n')
+        self.assertEqual(config.reload().changed, {'opt'})
+        self.assertEqual(config['opt'], '2')
+
+    def test_items_across_reload(self):
+        path = self.write('config.conf', 'a.x = 1\na.y = 2\na.z = 3\n')
+        config = ReloadableConfig(path)
+        expected = [('x', '1'), ('y', '2'), ('z', '3')]
+        for items, prefix in ((config.items(), 'a.'),
+                              (config.items('a'), ''),
+                              (config['a':].items(), '')):
+            first = next(items)
+            self.write('config.conf', 'a.x = 10\na.z = 30\n')
+            config.reload()
+            self.assertEqual([first] + list(items),
+                             [(prefix + x, y) for x, y in expected])
+            self.assertEqual(config['a.z'], '30')
+            self.write('config.conf', 'a.x = 1\na.y = 2\na.z = 3\n')
+            config.reload()
+
+    def test_reload_error(self):
+        path = self.write('config.conf', 'opt = 1\n')
+        config = ReloadableConfig(path)
+        self.write('config.conf', 'opt = 2\n.bad = 3\n')
+        with self.assertRaises(ParsingError):
+            config.reload()
+        self.assertEqual(config['opt'], '1')
+        self.write('config.conf', 'opt = 2\n')
+        self.assertEqual(config.reload().changed, {'opt'})
+
+
+if __name__ == '__main__':
+    unittest.main()
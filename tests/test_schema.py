@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# coding: utf-8
+
+import unittest
+
+from yaconf import PlainConfig, Schema, SchemaError
+from yaconf.utils import str2bool, str2iter
+
+
+class SchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = Schema({
+            'host': str,
+            'port': (int, 5432),
+            'debug': (str2bool, False),
+            'pool.size': int,
+            'tags': (str2iter, ()),
+            'weights.*': float,
+        })
+
+    def test_apply(self):
+        config = PlainConfig({'db.host': 'local', 'db.debug': 'on',
+                              'db.pool.size': '4', 'db.tags': 'a, b',
+                              'db.weights.x': '0.5', 'db.weights.y': '2'})
+        self.assertEqual(self.schema.fields,
+                         ('debug', 'host', 'pool_size', 'port', 'tags',
+                          'weights'))
+        expected = {'host': 'local', 'port': 5432, 'debug': True,
+                    'pool_size': 4, 'tags': ['a', 'b'],
+                    'weights': {'x': 0.5, 'y': 2.0}}
+        self.assertEqual(self.schema.apply(config['db':]), expected)
+
+        record = self.schema.record(config['db':])
+        self.assertEqual(record.pool_size, 4)
+        self.assertEqual(record.as_dict(), expected)
+        self.assertEqual(record, self.schema.record(config['db':]))
+        with self.assertRaises(AttributeError):
+            record.unknown = 1
+
+        config = PlainConfig({'host': 'h', 'pool.size': 1, 'tags': 'a'})
+        other = self.schema.apply(config)
+        self.assertEqual((other['port'], other['tags'], other['weights']),
+                         (5432, ['a'], {}))
+        other['weights']['z'] = 1.0
+        other['tags'].append('b')
+        self.assertEqual(self.schema.apply(config),
+                         dict(other, tags=['a'], weights={}))
+
+    def test_errors(self):
+        config = PlainConfig({'port': 'x', 'weights.a': '1', 'weights.b': 'y'})
+        with self.assertRaises(SchemaError) as ctx:
+            self.schema.apply(config)
+        self.assertEqual(str(ctx.exception).splitlines(), [
+            'missing option: host',
+            'missing option: pool.size',
+            "invalid option port: invalid literal for int() with base 10: "
+            "'x'",
+            "invalid option weights: could not convert string to float: "
+            "'y'",
+        ])
+
+        with self.assertRaises(SchemaError):
+            Schema({'a.b': str, 'a_b': str})
+        with self.assertRaises(SchemaError):
+            Schema({'1opt': str, 'class': str})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# coding: utf-8
+
+import copy
+import random
+import unittest
+
+from yaconf import PlainConfig
+from yaconf.storage import (CompactStorage, CompactTable, DictStorage,
+                            LayeredStorage)
+
+
+class StorageTest(unittest.TestCase):
+
+    def assertSameStorage(self, storage, expected):
+        self.assertEqual(len(storage), len(expected))
+        self.assertEqual(list(storage.items()), list(expected.items()))
+        self.assertEqual(sorted(storage), sorted(expected))
+        self.assertEqual(storage, expected)
+        self.assertEqual(list(storage.sections()), list(expected.sections()))
+        for prefix in ('s0', 's1', 's1.x', 's-1', 'none'):
+            self.assertEqual(list(storage.keys(prefix)),
+                             list(expected.keys(prefix)))
+            self.assertEqual(storage.count(prefix), expected.count(prefix))
+            self.assertEqual(list(storage.sections(prefix)),
+                             list(expected.sections(prefix)))
+
+    def random_ops(self, storages, seed, num=3000):
+        rnd = random.Random(seed)
+        names = ['s0', 's1', 's1.x', 's-1', 's1-x', 'opt', 'n\xe9']
+        for _ in range(num):
+            opt = '.'.join(rnd.choice(names) for _ in range(rnd.randint(1, 3)))
+            action = rnd.random()
+            if action < 0.6:
+                value = str(rnd.random())
+                for storage in storages:
+                    storage[opt] = value
+            elif action < 0.8:
+                data = {opt + str(idx): str(idx) for idx in range(5)}
+                for storage in storages:
+                    storage.update(data)
+            elif action < 0.9:
+                if opt in storages[0]:
+                    for storage in storages:
+                        del storage[opt]
+            elif action < 0.95:
+                opts = list(storages[0].keys(opt))[::2]
+                for storage in storages:
+                    storage.delete(opts)
+            else:
+                for storage in storages:
+                    storage.delete_prefix(opt)
+
+    def test_compact_table(self):
+        data = {'a': '1', 'a.b': 'ф', 'a.c.d': '', 'a-b.c': '3'}
+        table = CompactTable.from_items(sorted(data.items()))
+        self.assertEqual(dict(table.items()), data)
+        self.assertEqual(table['a.b'], 'ф')
+        self.assertFalse('a.bb' in table)
+        self.assertEqual(list(table.sections()), ['a-b', 'a'])
+        self.assertEqual(list(table.keys('a')), ['a.b', 'a.c.d'])
+        with self.assertRaises(KeyError):
+            table['a.']
+        self.assertEqual(len(CompactTable()), 0)
+        table = CompactTable.from_items([('a', 1), ('b', 2.5)])
+        self.assertEqual(dict(table.items()), {'a': '1', 'b': '2.5'})
+
+        compact = CompactStorage()
+        compact._COMPACT_MIN = 5
+        for idx in range(10):
+            compact['opt{:d}'.format(idx)] = idx
+        self.assertEqual(compact['opt0'], '0')
+        self.assertEqual(len(compact), 10)
+
+    def test_random_ops(self):
+        for seed in range(3):
+            expected = DictStorage()
+            compact = CompactStorage()
+            compact._COMPACT_MIN = 50
+            layered = LayeredStorage(DictStorage({'s0.base': '1'}))
+            expected['s0.base'] = compact['s0.base'] = '1'
+            storages = [expected, compact, layered]
+
+            self.random_ops(storages, seed)
+            for storage in storages[1:]:
+                self.assertSameStorage(storage, expected)
+
+            storages = [expected.copy(), compact.copy(), layered.copy()]
+            self.random_ops(storages, seed + 10, 500)
+            for storage in storages[1:]:
+                self.assertSameStorage(storage, storages[0])
+
+    def test_layer(self):
+        base = DictStorage({'s{:d}.opt{:d}'.format(idx % 10, idx): str(idx)
+                            for idx in range(2000)})
+        layered = LayeredStorage(base)
+        layered._MERGE_MIN = 100
+        for sec in range(5):
+            layered.delete_prefix('s{:d}'.format(sec))
+        self.assertEqual(len(layered._deleted), 1000)
+        self.assertEqual(layered.count('s1'), 0)
+        self.assertEqual(layered.count('s7'), 200)
+        self.assertEqual(list(layered.sections()),
+                         ['s5', 's6', 's7', 's8', 's9'])
+        layered['s1.new'] = 'new'
+        self.assertEqual(layered.count('s1'), 1)
+        self.assertEqual(list(layered.sections('s1')), [])
+
+        fingerprint = layered.fingerprint('s7')
+        merged = layered.merged()
+        self.assertIs(type(merged), DictStorage)
+        self.assertSameStorage(merged, layered)
+        self.assertIsNotNone(merged._fingerprints)
+        self.assertEqual(merged.fingerprint('s7'), fingerprint)
+        self.assertIs(LayeredStorage(base).merged().__class__,
+                      LayeredStorage)
+
+        config = PlainConfig({'s{:d}.opt{:d}'.format(idx % 10, idx): str(idx)
+                              for idx in range(3000)})
+        other = copy.copy(config)
+        for sec in range(5):
+            del config['s{:d}'.format(sec):]
+        config['s0.new'] = 'new'
+        self.assertIs(type(config._data), DictStorage)
+        self.assertEqual(len(config), 1501)
+        self.assertEqual(len(other), 3000)
+
+    def test_fingerprint(self):
+        prefixes = (None, 's0', 's1', 's1.x', 's-1', 'none')
+        for seed in range(3):
+            compact = CompactStorage()
+            compact._COMPACT_MIN = 50
+            storages = [DictStorage(), compact,
+                        LayeredStorage(DictStorage({'s0.base': '1'}))]
+            storages[0]['s0.base'] = storages[1]['s0.base'] = '1'
+            self.random_ops(storages, seed, 300)
+            for storage in storages:
+                storage.fingerprint()
+
+            self.random_ops(storages, seed + 10)
+            storages.append(storages[2].copy())
+            self.random_ops(storages, seed + 20, 300)
+            for storage in storages:
+                fresh = DictStorage(dict(storage.items()))
+                for prefix in prefixes:
+                    self.assertEqual(storage.fingerprint(prefix),
+                                     fresh.fingerprint(prefix))
+            self.assertEqual(storages[0].fingerprint(),
+                             storages[1].fingerprint())
+
+        config = PlainConfig({'a.x': '1', 'a.y.z': '2', 'b.x': '1',
+                              'b.y.z': '2', 'c': '3'})
+        self.assertEqual(config.fingerprint('a'), config.fingerprint('b'))
+        self.assertEqual(config['a':].fingerprint(), config.fingerprint('a'))
+        self.assertEqual(config['a':].fingerprint('y'),
+                         config.fingerprint('a.y'))
+        self.assertEqual(config['a':], config['b':])
+        self.assertEqual(config.fingerprint('none'), 0)
+
+        other = copy.copy(config)
+        self.assertEqual(other, config)
+        other['b.x'] = '2'
+        self.assertNotEqual(other, config)
+        self.assertNotEqual(other.fingerprint('b'), config.fingerprint('b'))
+        self.assertEqual(other.fingerprint('a'), config.fingerprint('a'))
+
+    def test_compact_config(self):
+        data = {'sec{:d}.opt{:d}'.format(idx % 10, idx): str(idx)
+                for idx in range(3000)}
+        config = PlainConfig(data, storage='compact')
+        self.assertIsInstance(config._data._base, CompactTable)
+        self.assertEqual(config, PlainConfig(data))
+        self.assertEqual(copy.deepcopy(config), config)
+        self.assertEqual(dict(config.items()), data)
+
+        shallow = copy.copy(config)
+        del shallow['sec1':]
+        self.assertEqual(len(config), 3000)
+        self.assertEqual(len(shallow), 2700)
+
+
+if __name__ == '__main__':
+    unittest.main()
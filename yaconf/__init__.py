@@ -1,7 +1,14 @@
 # coding: utf-8
 
-from .plain_config import PlainConfig
-from .exceptions import Error, ParsingError
+from .plain_config import PlainConfig, PlainConfigView
+from .exceptions import (Error, InterpolationError, ParsingError,
+                         SchemaError)
+from .diff import ConfigDiff, Conflict, merge3
+from .parser import iterparse
+from .reload import ReloadableConfig
+from .schema import Schema
 
 
-__all__ = ['PlainConfig', 'Error', 'ParsingError']
+__all__ = ['PlainConfig', 'PlainConfigView', 'Error', 'InterpolationError',
+           'ParsingError', 'SchemaError', 'ConfigDiff', 'Conflict',
+           'ReloadableConfig', 'Schema', 'iterparse', 'merge3']
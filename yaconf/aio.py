@@ -0,0 +1,60 @@
+# coding: utf-8
+
+import asyncio
+import inspect
+import io
+
+from .parser import BLOCK_SIZE, PARSERS
+
+
+async def aupdate(config, source):
+    """Asynchronous PlainConfig.update().
+
+    Paths and file objects are read and parsed in the default executor,
+    async streams (objects with coroutine read()) are read on the loop.
+    Lists of sources are loaded concurrently and merged in declared order,
+    nothing is merged if any of the sources fails.
+    """
+    sources = source if isinstance(source, (list, tuple)) else [source]
+    results = await asyncio.gather(*[_parse(config, x) for x in sources])
+
+    for source, data in zip(sources, results):
+        if data is None:
+            config.update(source)
+        elif isinstance(source, str):
+            config._update_parsed(source, data)
+        else:
+            config.update(data)
+
+
+async def aload(cls, sources, **kwargs):
+    config = cls(**kwargs)
+    await aupdate(config, sources)
+    return config
+
+
+async def _parse(config, source):
+    loop = asyncio.get_event_loop()
+    parse = PARSERS[config._parser]
+
+    if isinstance(source, str):
+        return await loop.run_in_executor(None, config._parse_path, source)
+    if not hasattr(source, 'read'):
+        return None
+
+    if not inspect.iscoroutinefunction(source.read):
+        return await loop.run_in_executor(None, parse, source,
+                                          config._strict)
+
+    chunks = []
+    chunk = await source.read(BLOCK_SIZE)
+    while chunk:
+        chunks.append(chunk)
+        chunk = await source.read(BLOCK_SIZE)
+
+    if chunks and isinstance(chunks[0], bytes):
+        fileobj = io.TextIOWrapper(io.BytesIO(b''.join(chunks)),
+                                   encoding=config._encoding)
+    else:
+        fileobj = io.StringIO(''.join(chunks))
+    return await loop.run_in_executor(None, parse, fileobj, config._strict)
@@ -0,0 +1,105 @@
+# coding: utf-8
+
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from .parser import PARSERS
+
+
+SourceCacheInfo = namedtuple('SourceCacheInfo',
+                             'hits, misses, evictions, entries, size')
+
+
+class SourceCache(object):
+    """LRU cache of parsed config files.
+
+    Entries are keyed by real path, mtime, size, encoding, strict mode
+    and parser, so a changed file is parsed again. A file rewritten
+    within the mtime resolution without changing its size is not noticed.
+    Memory used by the cached options is estimated and kept under
+    max_size bytes by evicting least recently used files. Cached options
+    are shared between configs and must not be modified.
+    """
+
+    # estimated bytes per option besides the text: two str headers and
+    # a dict entry
+    _OPTION_OVERHEAD = 160
+
+    def __init__(self, max_size=64 << 20):
+        super(SourceCache, self).__init__()
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # key: (options, size)
+        self._entries = OrderedDict()
+        # real path: key of its current entry
+        self._keys = {}
+        self._size = 0
+        self._hits = self._misses = self._evictions = 0
+
+    def get(self, path, encoding='utf-8', strict=True, parser='fast'):
+        """Return options of the file, {} if it doesn't exist."""
+        real_path = os.path.realpath(path)
+        try:
+            stat = os.stat(real_path)
+        except OSError:
+            return {}
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        key = (real_path, mtime, stat.st_size, encoding, strict, parser)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # parse outside of the lock, concurrent misses of the same file
+        # are parsed twice and the last one is kept
+        with io.open(real_path, 'r', encoding=encoding) as fileobj:
+            data = PARSERS[parser](fileobj, strict)
+        size = sum(len(opt) + len(val) for opt, val in data.items())
+        size += self._OPTION_OVERHEAD * len(data)
+
+        with self._lock:
+            self._discard(self._keys.pop(real_path, None))
+            if size <= self.max_size:
+                self._entries[key] = (data, size)
+                self._keys[real_path] = key
+                self._size += size
+                while self._size > self.max_size:
+                    old_key = next(iter(self._entries))
+                    del self._keys[old_key[0]]
+                    self._discard(old_key)
+                    self._evictions += 1
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._size = 0
+
+    def info(self):
+        with self._lock:
+            return SourceCacheInfo(self._hits, self._misses,
+                                   self._evictions, len(self._entries),
+                                   self._size)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return '<{}: {:d} files, {:d} bytes>'.format(
+            type(self).__name__, len(self._entries), self._size)
+
+
+# shared by configs created with source_cache=True
+SOURCE_CACHE = SourceCache()
@@ -0,0 +1,152 @@
+# coding: utf-8
+
+import heapq
+import itertools
+from collections import namedtuple
+
+from .plain_config import PlainConfig, PlainConfigView
+from .storage import DictStorage, LayeredStorage
+
+
+ConfigDiff = namedtuple('ConfigDiff', 'added, removed, changed')
+Conflict = namedtuple('Conflict', 'option, base, ours, theirs')
+
+_END = object()
+
+
+def iterdiff(config, other, prefix=None):
+    """Yield (option, old value, new value) of every differing option.
+
+    Missing values are None, options go sorted and are relative to the
+    prefix. Raw values are compared by a single pass over both sorted
+    option tables, configs layered over the same options compare only
+    their own changes.
+    """
+    storage, opt_prefix = _storage(config, prefix)
+    other_storage, other_prefix = _storage(other, prefix)
+    prefix = opt_prefix
+
+    if (prefix == other_prefix and isinstance(storage, LayeredStorage) and
+            isinstance(other_storage, LayeredStorage) and
+            storage._base is other_storage._base):
+        skip = 0 if prefix is None else len(prefix) + 1
+        for opt in _layer_changes(storage, other_storage, prefix):
+            old, new = storage.get(opt), other_storage.get(opt)
+            if old != new:
+                yield opt[skip:], old, new
+        return
+
+    # both streams end with the sentinel, so zip() never drops an item
+    end = ((_END, None),)
+    items = itertools.chain(_items(storage, prefix), end)
+    other_items = itertools.chain(_items(other_storage, other_prefix), end)
+    opt, value = next(items)
+    other_opt, other_value = next(other_items)
+    while opt is not _END and other_opt is not _END:
+        if opt == other_opt:
+            if value != other_value:
+                yield opt, value, other_value
+            # aligned options are compared in bulk
+            for (opt, value), (other_opt, other_value) in zip(items,
+                                                              other_items):
+                if opt != other_opt or opt is _END:
+                    break
+                if value != other_value:
+                    yield opt, value, other_value
+        elif opt < other_opt:
+            yield opt, value, None
+            opt, value = next(items)
+        else:
+            yield other_opt, None, other_value
+            other_opt, other_value = next(other_items)
+
+    while opt is not _END:
+        yield opt, value, None
+        opt, value = next(items)
+    while other_opt is not _END:
+        yield other_opt, None, other_value
+        other_opt, other_value = next(other_items)
+
+
+def diff(config, other, prefix=None):
+    """Return ConfigDiff of {option: new}, {option: old} and changed
+    {option: (old, new)} dicts.
+    """
+    added, removed, changed = {}, {}, {}
+    for opt, old, new in iterdiff(config, other, prefix):
+        if old is None:
+            added[opt] = new
+        elif new is None:
+            removed[opt] = old
+        else:
+            changed[opt] = (old, new)
+    return ConfigDiff(added, removed, changed)
+
+
+def merge3(base, ours, theirs):
+    """Three-way merge of configs derived from the common base.
+
+    Changes made on one side only are taken, equal changes are taken
+    once. Options changed differently on both sides keep our value and
+    are reported as Conflict(option, base, ours, theirs) with None for
+    missing values. Returns (merged PlainConfig, conflicts).
+    """
+    data = {}
+    conflicts = []
+    streams = [_items(*_storage(x, None)) for x in (base, ours, theirs)]
+    for opt, (base_value, value, their_value) in _align(streams):
+        if value != their_value:
+            if value == base_value:
+                value = their_value
+            elif their_value != base_value:
+                conflicts.append(Conflict(opt, base_value, value,
+                                          their_value))
+        if value is not None:
+            data[opt] = value
+
+    config = PlainConfig(strict=ours._strict, encoding=ours._encoding,
+                         parser=ours._parser)
+    config._data = DictStorage.from_sorted(data)
+    return config, conflicts
+
+
+def _storage(config, prefix):
+    if isinstance(config, PlainConfigView):
+        if prefix is None:
+            return config._parent._data, config._prefix
+        return config._parent._data, config._opt_prefix + prefix
+    return config._data, prefix
+
+
+def _items(storage, prefix):
+    if prefix is None:
+        return iter(storage.items())
+    skip = len(prefix) + 1
+    return ((opt[skip:], value) for opt, value in storage.items(prefix))
+
+
+def _layer_changes(storage, other, prefix):
+    opts = set()
+    for layer in (storage, other):
+        opts.update(layer._top.keys(prefix))
+        opts.update(layer._deleted.keys(prefix))
+    return sorted(opts)
+
+
+def _tagged(items, idx):
+    for opt, value in items:
+        yield opt, idx, value
+
+
+def _align(streams):
+    """Yield (option, [value of every stream or None]) sorted by option."""
+    last, values = None, None
+    merged = heapq.merge(*[_tagged(x, idx) for idx, x in enumerate(streams)])
+    for opt, idx, value in merged:
+        if opt != last:
+            if values is not None:
+                yield last, values
+            last, values = opt, [None] * len(streams)
+        values[idx] = value
+    if values is not None:
+        yield last, values
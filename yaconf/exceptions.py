@@ -7,3 +7,11 @@ class Error(Exception):
 
 class ParsingError(Error):
     """Error while parse config file."""
+
+
+class SchemaError(Error):
+    """Error while apply schema to config."""
+
+
+class InterpolationError(Error):
+    """Error while resolve option references."""
@@ -0,0 +1,119 @@
+# coding: utf-8
+
+import re
+
+from .exceptions import InterpolationError
+
+
+# ${option} is a reference, $$ is a literal $
+REFERENCE = re.compile(r'\$(?:\$|\{([^{}]*)\})')
+
+
+def compile_value(value):
+    """Split value into [text, option, text, ..., option, text] parts."""
+    parts, text, pos = [], [], 0
+    for m in REFERENCE.finditer(value):
+        text.append(value[pos:m.start()])
+        if m.group(1) is None:
+            text.append('$')
+        else:
+            parts.append(''.join(text))
+            parts.append(m.group(1))
+            text = []
+        pos = m.end()
+    text.append(value[pos:])
+    parts.append(''.join(text))
+    return parts
+
+
+class Interpolator(object):
+    """Resolver of ${option} references with memoized results.
+
+    Every option is resolved at most once until it or one of the options
+    it refers to is changed. References are tracked in both directions,
+    so invalidate() drops exactly the changed options and their
+    dependents. Resolution uses an explicit stack, so reference chains
+    are not limited by the recursion limit.
+    """
+
+    def __init__(self):
+        super(Interpolator, self).__init__()
+        self._values = {}
+        # option: compiled parts, option: referenced options and back
+        self._parts = {}
+        self._refs = {}
+        self._dependents = {}
+
+    def resolve(self, data, opt, value):
+        try:
+            return self._values[opt]
+        except KeyError:
+            pass
+        if '$' not in value:
+            return value
+
+        values = self._values
+        stack = [[opt, self._compile(opt, value), 1]]
+        active = {opt}
+        while stack:
+            item = stack[-1]
+            cur, parts, idx = item
+            while idx < len(parts):
+                ref = parts[idx]
+                idx += 2
+                if ref in values:
+                    continue
+                ref_value = data.get(ref)
+                if ref_value is None:
+                    msg = '{}: undefined reference: {}'
+                    raise InterpolationError(msg.format(cur, ref))
+                if '$' not in ref_value:
+                    continue
+                if ref in active:
+                    chain = [x[0] for x in stack]
+                    chain = chain[chain.index(ref):] + [ref]
+                    msg = 'reference cycle: {}'
+                    raise InterpolationError(msg.format(' -> '.join(chain)))
+                item[2] = idx
+                active.add(ref)
+                stack.append([ref, self._compile(ref, ref_value), 1])
+                break
+            else:
+                stack.pop()
+                active.discard(cur)
+                values[cur] = ''.join(
+                    x if pos % 2 == 0 else
+                    values[x] if x in values else data[x]
+                    for pos, x in enumerate(parts))
+        return values[opt]
+
+    def invalidate(self, opts):
+        """Forget changed options, returns them with all dependents."""
+        values, dependents = self._values, self._dependents
+        changed = set(opts)
+        for opt in changed:
+            self._parts.pop(opt, None)
+            for ref in self._refs.pop(opt, ()):
+                refs = dependents[ref]
+                refs.discard(opt)
+                if not refs:
+                    del dependents[ref]
+
+        stack = list(changed)
+        while stack:
+            opt = stack.pop()
+            values.pop(opt, None)
+            for dependent in dependents.get(opt, ()):
+                if dependent not in changed:
+                    changed.add(dependent)
+                    stack.append(dependent)
+        return changed
+
+    def _compile(self, opt, value):
+        parts = self._parts.get(opt)
+        if parts is None:
+            parts = self._parts[opt] = compile_value(value)
+            refs = self._refs[opt] = frozenset(parts[1::2])
+            for ref in refs:
+                self._dependents.setdefault(ref, set()).add(opt)
+        return parts
@@ -0,0 +1,203 @@
+# coding: utf-8
+
+import io
+import itertools
+import os.path
+import re
+
+from .exceptions import Error, ParsingError
+
+
+CONFIG_LINE = re.compile(r'^\s*(?P<option>.*?)\s*=\s*(?P<value>.*)$')
+COMMENT_LINE = re.compile(r'^\s*#.*$')
+VALID_OPT = re.compile(r'(^[^.]+$)|(^[^.].*[^.]$)')
+
+BLOCK_SIZE = 1 << 20
+
+
+def read_blocks(fileobj, size=BLOCK_SIZE):
+    read = fileobj.read
+    block = read(size)
+    while block:
+        yield block
+        block = read(size)
+
+
+def scan(blocks):
+    """Split text blocks into options.
+
+    Yields (lineno, option, value) for every option definition, value
+    holds all continuation lines. Non-empty lines which can't be bound to
+    any option are yielded as (lineno, None, line).
+    """
+    lineno = opt_lineno = 0
+    opt = value = cont = None
+    tail = ''
+
+    for block in itertools.chain(blocks, (None,)):
+        if block is not None:
+            lines = (tail + block).split('\n')
+            tail, eol = lines.pop(), '\n'
+        elif tail:
+            lines, eol = [tail], ''
+        else:
+            break
+
+        for line in lines:
+            lineno += 1
+            pos = line.find('=')
+            if pos >= 0:
+                if opt is not None:
+                    if cont is not None:
+                        value = '\n'.join(cont).rstrip()
+                    yield opt_lineno, opt, value
+                opt, value, cont = line[:pos].strip(), line[pos + 1:], None
+                value = value.strip()
+                opt_lineno = lineno
+                continue
+
+            stripped = line.strip()
+            if not stripped or stripped[0] == '#':
+                continue
+            if opt is None:
+                yield lineno, None, line + eol
+            elif cont is None:
+                cont = [value, stripped]
+            else:
+                cont.append(stripped)
+
+    if opt is not None:
+        if cont is not None:
+            value = '\n'.join(cont).rstrip()
+        yield opt_lineno, opt, value
+
+
+def iterparse(source, prefix=None, encoding='utf-8', block_size=BLOCK_SIZE):
+    """Yield (lineno, option, value) of config file one by one.
+
+    source is a path or file object. Only options under prefix are yielded
+    when it's given. Memory doesn't depend on file size, so duplicates
+    aren't checked; the first malformed line raises ParsingError.
+    """
+    if not hasattr(source, 'read'):
+        with io.open(source, 'r', encoding=encoding) as fileobj:
+            for item in iterparse(fileobj, prefix, encoding, block_size):
+                yield item
+        return
+
+    opt_prefix = None if prefix is None else prefix + '.'
+    for lineno, opt, value in scan(read_blocks(source, block_size)):
+        if opt is None:
+            msg = '{:d}: value without option: {}'
+            raise ParsingError(msg.format(lineno, value))
+        if not opt or opt[0] == '.' or opt[-1] == '.':
+            msg = '{:d}: invalid option name: {}'
+            raise ParsingError(msg.format(lineno, opt))
+        if opt_prefix is None or opt.startswith(opt_prefix):
+            yield lineno, opt, value
+
+
+def write_options(fileobj, items, block_size=BLOCK_SIZE):
+    """Write (option, value) pairs in the format read by scan().
+
+    Multi-line values are written as continuation lines indented by four
+    spaces. Lines are joined into chunks of about block_size characters,
+    so the output is never built in memory at once. Values which are not
+    strings are written as str() of them. Options which would read back
+    differently raise Error, everything before them is already written
+    at that point.
+    """
+    chunk, size = [], 0
+    for opt, value in items:
+        if (not opt or opt.strip() != opt or opt[0] == '.' or
+                opt[-1] == '.' or '=' in opt or '\n' in opt or '\r' in opt):
+            raise Error('option can not be written: {!r}'.format(opt))
+        if not isinstance(value, str):
+            value = str(value)
+
+        if '\n' not in value:
+            if value.strip() != value or '\r' in value:
+                msg = 'value of {} can not be written: {!r}'
+                raise Error(msg.format(opt, value))
+            line = opt + ' = ' + value + '\n' if value else opt + ' =\n'
+        else:
+            lines = value.split('\n')
+            for idx, cont in enumerate(lines):
+                if cont.strip() != cont or '\r' in cont or idx and (
+                        not cont or cont[0] == '#' or '=' in cont):
+                    msg = 'value of {} can not be written: {!r}'
+                    raise Error(msg.format(opt, value))
+            line = (opt + ' = ' + lines[0] if lines[0] else opt + ' =') + \
+                ''.join('\n    ' + cont for cont in lines[1:]) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= block_size:
+            fileobj.write(''.join(chunk))
+            chunk, size = [], 0
+
+    if chunk:
+        fileobj.write(''.join(chunk))
+
+
+def parse(fileobj, strict=True, block_size=BLOCK_SIZE):
+    data = {}
+    cum_error = []
+
+    for lineno, opt, value in scan(read_blocks(fileobj, block_size)):
+        if opt is None:
+            msg = '{:d}: value without option: {}'
+            cum_error.append(msg.format(lineno, value))
+            continue
+        if not opt or opt[0] == '.' or opt[-1] == '.':
+            msg = '{:d}: invalid option name: {}'
+            cum_error.append(msg.format(lineno, opt))
+        if strict and opt in data:
+            msg = '{:d}: option duplicate: {}'
+            cum_error.append(msg.format(lineno, opt))
+        data[opt] = value
+
+    if cum_error:
+        raise ParsingError('\n'.join(cum_error))
+    return data
+
+
+def parse_regex(fileobj, strict=True):
+    """Reference line-by-line parser, parse() must give the same result."""
+    last_opt = None
+    data = {}
+    cum_error = []
+
+    for lineno, line in enumerate(fileobj, start=1):
+        m = CONFIG_LINE.match(line)
+        if m is not None:
+            last_opt = m.group('option')
+            if VALID_OPT.match(last_opt) is None:
+                msg = '{:d}: invalid option name: {}'
+                cum_error.append(msg.format(lineno, last_opt))
+            if strict and last_opt in data:
+                msg = '{:d}: option duplicate: {}'
+                cum_error.append(msg.format(lineno, last_opt))
+            data[last_opt] = [m.group('value').strip()]
+        else:
+            m = COMMENT_LINE.match(line)
+            if line.lstrip() and m is None:
+                if last_opt is None or last_opt not in data:
+                    msg = '{:d}: value without option: {}'
+                    cum_error.append(msg.format(lineno, line))
+                else:
+                    data[last_opt].append(line.strip())
+
+    if cum_error:
+        raise ParsingError('\n'.join(cum_error))
+
+    return {key: '\n'.join(items).rstrip() for key, items in data.items()}
+
+
+PARSERS = {'fast': parse, 'regex': parse_regex}
+
+
+def parse_path(path, encoding='utf-8', strict=True, parser='fast'):
+    if not os.path.exists(path):
+        return {}
+    with io.open(path, 'r', encoding=encoding) as fileobj:
+        return PARSERS[parser](fileobj, strict)
@@ -1,11 +1,15 @@
 # coding: utf-8
 
+import contextlib
 import copy
 import io
 import itertools
 import logging
 import os.path
-import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
 
 try:
     from collections.abc import Mapping
@@ -13,9 +17,9 @@ except ImportError:
     from collections import Mapping
 
 try:
-    from configparser import DEFAULTSECT
+    from configparser import DEFAULTSECT, ConfigParser, RawConfigParser
 except ImportError:
-    from ConfigParser import DEFAULTSECT
+    from ConfigParser import DEFAULTSECT, ConfigParser, RawConfigParser
 
 try:
     basestring
@@ -24,6 +28,12 @@ except NameError:
 
 
 from .exceptions import Error, ParsingError
+from .parser import PARSERS, CONFIG_LINE, COMMENT_LINE, VALID_OPT
+from .cache import SOURCE_CACHE
+from .interpolation import Interpolator
+from .parser import parse_path, write_options
+from .snapshot import compile_snapshot, load_snapshot
+from .storage import STORAGES, CompactTable, DictStorage, LayeredStorage
 
 
 logger = logging.getLogger('plain_config')
@@ -33,26 +43,226 @@ class EMPTY_VALUE(object):
     """Class to handle get() with empty default value."""
 
 
-class PlainConfig(object):
+ConvCacheInfo = namedtuple('ConvCacheInfo', 'hits, misses, size')
+# changes staged by batch() of one thread, opts are the changed options
+_Batch = namedtuple('_Batch', 'data, opts, interpolator')
+
+# converted values of these types can be shared between get() calls
+_IMMUTABLE_TYPES = frozenset([type(None), bool, int, float, complex, bytes,
+                              str, unicode])
+# mutable results are cached in the frozen form and rebuilt for every call
+_FROZEN_FORMS = {list: tuple, set: frozenset, bytearray: bytes}
+_Frozen = namedtuple('_Frozen', 'value, thaw')
+
+
+class _UNCACHED(object):
+    """Conversion cache entry of results which can't be shared."""
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# parsers which option tables are accessed directly, see _raw_tables()
+_STDLIB_PARSERS = (ConfigParser, RawConfigParser)
+
+try:
+    _get_ident = threading.get_ident
+except AttributeError:
+    import thread
+    _get_ident = thread.get_ident
+
 
-    _CONFIG_LINE = re.compile('^\s*(?P<option>.*?)\s*=\s*(?P<value>.*)$')
-    _COMMENT_LINE = re.compile('^\s*#.*$')
-    _VALID_OPT = re.compile('(^[^.]+$)|(^[^.].*[^.]$)')
+class PlainConfig(object):
 
-    def __init__(self, data=None, strict=True, encoding='utf-8'):
+    _CONFIG_LINE = CONFIG_LINE
+    _COMMENT_LINE = COMMENT_LINE
+    _VALID_OPT = VALID_OPT
+    # max number of cached converters per option
+    _CONV_CACHE_WIDTH = 16
+    # dict of the options if they are a plain DictStorage read without
+    # stats and interpolation, get() uses it directly, set() only while
+    # no other storage is based on it and no fingerprints are maintained
+    _values = _owned_values = None
+
+    def __init__(self, data=None, strict=True, encoding='utf-8',
+                 conv_cache=True, parser='fast', jobs=None, processes=False,
+                 stats=None, storage='dict', interpolation=False,
+                 source_cache=None):
         super(PlainConfig, self).__init__()
-        self._data = {}
+        if parser not in PARSERS:
+            raise Error('unknown parser: {}'.format(parser))
+        if storage not in STORAGES:
+            raise Error('unknown storage: {}'.format(storage))
+        # thread ident: _Batch of the thread
+        self._batches = {}
+        self._publish_lock = threading.Lock()
         self._strict = strict
         self._encoding = encoding
-
-        if data is not None:
+        self._parser = parser
+        self._conv_cache = {} if conv_cache else None
+        self._conv_hits = self._conv_misses = 0
+        self._stats = stats
+        self._interpolator = Interpolator() if interpolation else None
+        self._data = STORAGES[storage]()
+        if source_cache is True:
+            source_cache = SOURCE_CACHE
+        elif source_cache is False:
+            source_cache = None
+        self._source_cache = source_cache
+
+        if jobs and isinstance(data, (list, tuple)):
+            self._update_parallel(data, jobs, processes)
+        elif data is not None:
             try:
                 self.update(data)
             except Error:
                 for item in data:
                     self.update(item)
 
+    @classmethod
+    def compile(cls, path, cache_dir=None, strict=True, encoding='utf-8',
+                parser='fast'):
+        return compile_snapshot(path, cache_dir, strict, encoding, parser)[0]
+
+    @classmethod
+    def load(cls, path, cache=True, cache_dir=None, **kwargs):
+        config = cls(**kwargs)
+        if not cache:
+            config.update(path)
+        elif os.path.exists(path):
+            data = load_snapshot(path, cache_dir, config._strict,
+                                 config._encoding, config._parser)
+            if isinstance(config._data, DictStorage):
+                config._data = DictStorage.from_sorted(data)
+            else:
+                config._data.update(data)
+        return config
+
+    @classmethod
+    def attach(cls, path, writable=False, **kwargs):
+        config = cls(**kwargs)
+        table = CompactTable.attach(path)
+        config._data = LayeredStorage(table) if writable else table
+        return config
+
+    def export(self, path):
+        table = CompactTable.from_items(self._data.items())
+        dirname = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fileobj:
+                table.dump(fileobj)
+            getattr(os, 'replace', os.rename)(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def dump(self, fileobj, prefix=None, sort=True):
+        """Write options to text file object in config file format.
+
+        Only the subtree is written if prefix is given, with option names
+        relative to it. The output parses back to an equal config.
+        """
+        data = self._data
+        if prefix is not None:
+            skip = len(prefix) + 1
+            items = ((opt[skip:], val) for opt, val in data.items(prefix))
+        elif sort:
+            items = data.items()
+        else:
+            items = ((opt, data[opt]) for opt in data)
+        write_options(fileobj, items)
+
+    @classmethod
+    def from_configparser(cls, config, raw=True, **kwargs):
+        """Create config from ConfigParser.
+
+        In raw mode values are taken as stored, without interpolation, and
+        defaults are imported once as DEFAULT section instead of being
+        repeated in every section.
+        """
+        obj = cls(**kwargs)
+        obj._timed('update', obj._update_config, config, raw)
+        return obj
+
+    def to_configparser(self):
+        """Export options as ConfigParser without interpolation.
+
+        Top level sections become ConfigParser sections, option names are
+        kept case-sensitive. Every option has to belong to a section.
+        """
+        data = self._data
+        config = ConfigParser(interpolation=None)
+        config.optionxform = str
+
+        tables = _raw_tables(config)
+        num = 0
+        for section in data.sections():
+            skip = len(section) + 1
+            options = {opt[skip:]: val if isinstance(val, str) else str(val)
+                       for opt, val in data.items(section)}
+            if tables is None:
+                config.read_dict({section: options})
+            elif section == DEFAULTSECT:
+                tables[0].update(options)
+            else:
+                # the parser is new, so options go to its tables as they are
+                config.add_section(section)
+                tables[1][section].update(options)
+            num += len(options)
+
+        if num != len(data):
+            cum_error = []
+            for opt in data.keys():
+                if '.' not in opt:
+                    msg = 'option without section: {}'
+                    cum_error.append(msg.format(opt))
+            raise Error('\n'.join(cum_error))
+        return config
+
+    @classmethod
+    def aload(cls, sources, **kwargs):
+        from .aio import aload
+        return aload(cls, sources, **kwargs)
+
+    def aupdate(self, source):
+        from .aio import aupdate
+        return aupdate(self, source)
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats):
+        self._stats = stats
+        # reads are counted from now on, so no more direct ones
+        self._data = self._storage
+
+    @property
+    def _data(self):
+        # the options seen by this thread, staged ones inside batch()
+        batches = self._batches
+        if batches:
+            batch = batches.get(_get_ident())
+            if batch is not None:
+                return batch.data
+        return self._storage
+
+    @_data.setter
+    def _data(self, data):
+        self._storage = data
+        values = owned = None
+        if (type(data) is DictStorage and self._stats is None and
+                self._interpolator is None):
+            values = data._dict
+            if not data.shared and data._fingerprints is None:
+                owned = values
+        self._values = values
+        self._owned_values = owned
+
     def update(self, data):
+        return self._timed('update', self._update, data)
+
+    def _update(self, data):
         if (isinstance(data, PlainConfig) or
                 (hasattr(data, 'sections') and hasattr(data, 'items'))):
             self._update_config(data)
@@ -66,79 +276,175 @@ class PlainConfig(object):
             type_str = type(data).__name__
             raise Error('unknown data type: {}'.format(type_str))
 
-    def get(self, opt, default=EMPTY_VALUE, conv=str):
-        if opt in self._data:
-            return conv(self._data[opt])
+    def get(self, opt, default=EMPTY_VALUE, conv=str, cache=True):
+        values = self._values
+        if (values is not None and conv is str and opt in values and
+                not self._batches):
+            return str(values[opt])
+        if self._stats is not None:
+            self._stats.on_read(opt)
+        data, interpolator, conv_cache = self._state()
+        raw = data.get(opt, EMPTY_VALUE)
+        if raw is not EMPTY_VALUE:
+            if interpolator is not None:
+                raw = interpolator.resolve(data, opt, raw)
+            if conv is str or conv_cache is None or not cache:
+                return conv(raw)
+            try:
+                value = conv_cache[opt][conv]
+            except KeyError:
+                value = conv(raw)
+                convs = conv_cache.setdefault(opt, {})
+                if len(convs) >= self._CONV_CACHE_WIDTH:
+                    convs.clear()
+                try:
+                    convs[conv] = _cache_entry(value)
+                except TypeError:
+                    # unhashable converters are not cached
+                    return value
+                self._conv_misses += 1
+                return value
+            except TypeError:
+                return conv(raw)
+            if value is _UNCACHED:
+                return conv(raw)
+            self._conv_hits += 1
+            if type(value) is _Frozen:
+                return value.thaw(value.value)
+            return value
         if default is not EMPTY_VALUE:
             return default
         raise KeyError(opt)
 
     def set(self, opt, value, conv=str):
-        value = self._data[opt] = conv(value)
+        values = self._owned_values
+        if values is not None and opt in values and not self._batches:
+            # the option keeps its place in the key index
+            value = values[opt] = conv(value)
+            if self._conv_cache:
+                self._conv_cache.pop(opt, None)
+            return value
+        value = self._writable()[opt] = conv(value)
+        self._invalidate((opt,))
         return value
 
+    def diff(self, other, prefix=None):
+        from .diff import diff
+        return diff(self, other, prefix)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Apply all changes made inside the with block at once.
+
+        Changes of the thread are staged in a private layer over the
+        current options, reads of the thread inside the block see them,
+        other threads see the committed options only. On success the
+        staged changes are published at once as a new layer over the
+        then current options, on exception nothing is changed. Nested
+        batches join the outermost one.
+        """
+        ident = _get_ident()
+        if ident in self._batches:
+            yield self
+            return
+
+        storage = self._storage
+        # the staged layer relies on its base staying as it is
+        storage.shared = True
+        self._owned_values = None
+        interpolator = None
+        if self._interpolator is not None:
+            interpolator = Interpolator()
+        batch = _Batch(LayeredStorage(storage), set(), interpolator)
+        self._batches[ident] = batch
+        try:
+            yield self
+        finally:
+            del self._batches[ident]
+        self._timed('batch', self._commit, batch)
+
+    def conv_cache_info(self):
+        size = sum(1 for convs in (self._conv_cache or {}).values()
+                   for value in convs.values() if value is not _UNCACHED)
+        return ConvCacheInfo(self._conv_hits, self._conv_misses, size)
+
     def sections(self):
-        for section, _ in itertools.groupby(
-            sorted(self._data),
-            key=lambda x: x.split('.')[0] if '.' in x else None
-        ):
-            if section is not None:
-                yield section
+        if self._stats is None:
+            return self._data.sections()
+        sections = self._timed('sections', list, self._data.sections())
+        return iter(sections)
 
     def items(self, prefix=None):
-        prefix_len = 0
-        opt_gen = self._data.keys()
-
-        if prefix is not None:
+        # every value comes from the storage the options were taken from,
+        # so options published meanwhile by reload() or batch() never mix
+        # with the old ones
+        stats = self._stats
+        data, interpolator, _ = self._state()
+        if prefix is None:
+            prefix_len = 0
+            items = ((opt, data[opt]) for opt in data)
+        else:
             prefix_len = len(prefix + '.')
-            opt_gen = (x for x in self._data if x.startswith(prefix + '.'))
+            items = data.items(prefix)
 
-        for opt in opt_gen:
-            yield opt[prefix_len:], self.get(opt)
+        for opt, value in items:
+            if stats is not None:
+                stats.on_read(opt)
+            if interpolator is not None:
+                value = interpolator.resolve(data, opt, value)
+            yield opt[prefix_len:], str(value)
 
     def subconfig(self, prefix):
         return self[prefix:]
 
+    def overlay(self, *overrides):
+        config = copy.copy(self)
+        for data in overrides:
+            config.update(data)
+        return config
+
     def __repr__(self):
-        return '<{}: {:d} opts>'.format(type(self).__name__, len(self._data))
+        return '<{}: {:d} opts>'.format(type(self).__name__, len(self))
 
     def __str__(self):
         return '\n'.join('{} = {}'.format(opt, val)
-                         for opt, val in sorted(self._data.items()))
+                         for opt, val in self._data.items())
+
+    def fingerprint(self, prefix=None):
+        # the storage maintains the fingerprints from now on
+        self._owned_values = None
+        return self._data.fingerprint(prefix)
 
     def __eq__(self, config):
+        if self is config:
+            return True
+        # fingerprints are maintained incrementally once requested
+        if self.fingerprint() != config.fingerprint():
+            return False
         return self._data == config._data
 
     def __getitem__(self, index):
         if isinstance(index, slice):
-            kwargs = {'strict': self._strict, 'encoding': self._encoding}
-            return type(self)(data=dict(self.items(index.start)), **kwargs)
+            return self._timed('slice_get', PlainConfigView, self,
+                               index.start)
+        values = self._values
+        if values is not None and index in values and not self._batches:
+            return str(values[index])
         return self.get(index)
 
     def __setitem__(self, index, value):
         if isinstance(index, slice):
-            if not isinstance(value, Mapping):
-                msg = '{} is not Mapping instance'.format(type(value).__name__)
-                raise Error(msg)
-
-            kwargs = {'strict': self._strict, 'encoding': self._encoding}
-            config = type(self)(data=value, **kwargs)
-
-            del self[index]
-            for k, v in config.items():
-                self.set('{}.{}'.format(index.start, k), v)
+            self._timed('slice_set', self._set_prefix, index.start, value)
             return value
 
         return self.set(index, value)
 
     def __delitem__(self, index):
         if isinstance(index, slice):
-            prefix = index.start + '.'
-            del_opts = [opt for opt in self if opt.startswith(prefix)]
-            for opt in del_opts:
-                del self[opt]
+            self._timed('slice_delete', self._delete_prefix, index.start)
         else:
-            del self._data[index]
+            del self._writable()[index]
+            self._invalidate((index,))
 
     def __contains__(self, opt):
         return opt in self._data
@@ -156,24 +462,88 @@ class PlainConfig(object):
         cls = self.__class__
         obj = cls.__new__(cls)
         obj.__dict__.update(self.__dict__)
+        obj._batches = {}
+        obj._publish_lock = threading.Lock()
+
+        # a copy taken inside batch() starts with the staged changes
+        data = self._data
+        if data.readonly:
+            obj._data = data
+        elif isinstance(data, LayeredStorage):
+            obj._data = data.copy()
+        else:
+            # the options become the base of the copy, this config keeps
+            # reading them as they are and layers its next change over them
+            data.shared = True
+            self._owned_values = None
+            obj._data = LayeredStorage(data)
+        if obj._conv_cache is not None:
+            obj._conv_cache = {}
+        if obj._interpolator is not None:
+            obj._interpolator = Interpolator()
         return obj
 
     def __deepcopy__(self, memo):
         cls = self.__class__
         obj = cls.__new__(cls)
         memo[id(self)] = obj
+        memo[id(self._stats)] = self._stats
+        memo[id(self._source_cache)] = self._source_cache
 
         for key, val in self.__dict__.items():
-            setattr(obj, key, copy.deepcopy(val, memo))
+            if key not in ('_storage', '_values', '_owned_values',
+                           '_batches', '_publish_lock'):
+                setattr(obj, key, copy.deepcopy(val, memo))
+        obj._batches = {}
+        obj._publish_lock = threading.Lock()
+        obj._data = copy.deepcopy(self._data, memo)
         return obj
 
-    def _update_config(self, config):
+    def _set_prefix(self, prefix, value):
+        if not isinstance(value, Mapping):
+            msg = '{} is not Mapping instance'.format(type(value).__name__)
+            raise Error(msg)
+
+        kwargs = {'strict': self._strict, 'encoding': self._encoding,
+                  'parser': self._parser}
+        config = type(self)(data=value, **kwargs)
+
+        prefix += '.'
+        data = {prefix + opt: val for opt, val in config.items()}
+        self._delete_prefix(prefix[:-1])
+        self._merge(data)
+
+    def _delete_prefix(self, prefix):
+        self._invalidate(self._writable().delete_prefix(prefix))
+
+    def _update_config(self, config, raw=False):
         if isinstance(config, PlainConfig):
-            return self._data.update(config._data)
+            return self._merge(config._data)
 
-        for section in itertools.chain((DEFAULTSECT,), config.sections()):
-            for opt, val in config.items(section):
-                self._data['{}.{}'.format(section, opt)] = val
+        data = {}
+        if not raw:
+            for section in itertools.chain((DEFAULTSECT,),
+                                           config.sections()):
+                prefix = section + '.'
+                data.update((prefix + opt, val)
+                            for opt, val in config.items(section))
+            return self._merge(data)
+
+        defaults = config.defaults()
+        prefix = DEFAULTSECT + '.'
+        data.update((prefix + opt, val) for opt, val in defaults.items())
+        tables = _raw_tables(config)
+        for section in config.sections():
+            prefix = section + '.'
+            if tables is not None:
+                # options of the section without the defaults merged in
+                items = tables[1][section].items()
+            else:
+                items = ((opt, val)
+                         for opt, val in config.items(section, raw=True)
+                         if opt not in defaults or defaults[opt] != val)
+            data.update((prefix + opt, val) for opt, val in items)
+        self._merge(data)
 
     def _update_dict(self, dict_data, conv=str):
         data = {}
@@ -188,42 +558,349 @@ class PlainConfig(object):
 
         if cum_error:
             raise ParsingError('\n'.join(cum_error))
-        self._data.update(data)
+        self._merge(data)
 
     def _update_path(self, path):
+        if self._source_cache is not None:
+            return self._merge(self._source_cache.get(
+                path, self._encoding, self._strict, self._parser))
         if not os.path.exists(path):
             return
         with io.open(path, 'r', encoding=self._encoding) as fileobj:
             self._update_file(fileobj)
 
-    def _update_file(self, fileobj):
-        last_opt = None
-        data = {}
-        cum_error = []
+    def _parse_path(self, path):
+        return parse_path(path, self._encoding, self._strict, self._parser)
 
-        for lineno, line in enumerate(fileobj, start=1):
-            m = self._CONFIG_LINE.match(line)
-            if m is not None:
-                last_opt = m.group('option')
-                if self._VALID_OPT.match(last_opt) is None:
-                    msg = '{:d}: invalid option name: {}'
-                    cum_error.append(msg.format(lineno, last_opt))
-                if self._strict and last_opt in data:
-                    msg = '{:d}: option duplicate: {}'
-                    cum_error.append(msg.format(lineno, last_opt))
-                data[last_opt] = [m.group('value').strip()]
-            else:
-                m = self._COMMENT_LINE.match(line)
-                if line.lstrip() and m is None:
-                    if last_opt is None or last_opt not in data:
-                        msg = '{:d}: value without option: {}'
-                        cum_error.append(msg.format(lineno, line))
-                    else:
-                        data[last_opt].append(line.strip())
+    def _update_parsed(self, path, data):
+        self.update(data)
 
+    def _update_parallel(self, sources, jobs, processes=False):
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor as Executor
+        else:
+            from concurrent.futures import ThreadPoolExecutor as Executor
+
+        paths = [x for x in sources if isinstance(x, basestring)]
+        with Executor(jobs) as executor:
+            futures = [executor.submit(parse_path, path, self._encoding,
+                                       self._strict, self._parser)
+                       for path in paths]
+
+        parsed = {}
+        cum_error = []
+        for path, future in zip(paths, futures):
+            try:
+                parsed[path] = future.result()
+            except ParsingError as e:
+                cum_error.extend('{}:{}'.format(path, line)
+                                 for line in str(e).splitlines())
         if cum_error:
             raise ParsingError('\n'.join(cum_error))
 
-        data = {key: '\n'.join(items).rstrip() for key, items in data.items()}
+        for source in sources:
+            if isinstance(source, basestring):
+                self._merge(parsed[source])
+            else:
+                self.update(source)
+
+    def _update_file(self, fileobj):
+        if self._stats is None:
+            data = PARSERS[self._parser](fileobj, self._strict)
+        else:
+            start, started = _tell(fileobj), _timer()
+            data = PARSERS[self._parser](fileobj, self._strict)
+            seconds, end = _timer() - started, _tell(fileobj)
+            size = None if None in (start, end) else end - start
+            source = getattr(fileobj, 'name', type(fileobj).__name__)
+            self._stats.on_parse(source, seconds, size, len(data))
+
         logger.debug('parsed %d options', len(data))
-        self._data.update(data)
+        self._merge(data)
+
+    def _merge(self, data):
+        self._writable().update(data)
+        self._invalidate(data)
+
+    def _writable(self):
+        data = self._data
+        if data is not self._storage:
+            return data
+        if data.shared:
+            if isinstance(data, LayeredStorage):
+                data = data.copy()
+            else:
+                data = LayeredStorage(data)
+            self._data = data
+        elif type(data) is LayeredStorage:
+            # grown layers are merged back for fast reads
+            merged = data.merged()
+            if merged is not data:
+                data = self._data = merged
+        return data
+
+    def _timed(self, op, func, *args):
+        if self._stats is None:
+            return func(*args)
+        started = _timer()
+        try:
+            return func(*args)
+        finally:
+            self._stats.on_timing(op, _timer() - started)
+
+    def _state(self):
+        # the options with the interpolator and the conversion cache
+        # resolving them, caches are taken before the options, see _swap()
+        conv_cache, interpolator = self._conv_cache, self._interpolator
+        batches = self._batches
+        if batches:
+            batch = batches.get(_get_ident())
+            if batch is not None:
+                # staged values are not cached
+                return batch.data, batch.interpolator, None
+        return self._storage, interpolator, conv_cache
+
+    def _commit(self, batch):
+        if self._storage.readonly:
+            raise Error('read-only options')
+        staged = batch.data
+        self._publish_layer(staged._deleted, staged._top, batch.opts)
+
+    def _publish_layer(self, deleted, data, opts):
+        # changes are applied to a new layer over the current options,
+        # readers keep the current ones until the layer replaces them
+        with self._publish_lock:
+            storage = self._storage
+            if isinstance(storage, LayeredStorage):
+                storage = storage.copy()
+            else:
+                storage = LayeredStorage(storage)
+            storage.delete([opt for opt in deleted if opt in storage])
+            storage.update(data)
+            self._swap(storage.merged(), opts)
+
+    def _swap(self, data, opts):
+        # readers take the conversion cache, the interpolator and the
+        # options in this order, so publishing them in reverse order never
+        # lets new caches be filled from old options
+        conv_cache, interpolator = self._conv_cache, self._interpolator
+        if interpolator is not None:
+            interpolator = Interpolator()
+            if conv_cache is not None:
+                conv_cache = {}
+        elif conv_cache is not None:
+            # copied at once, readers may be adding entries meanwhile
+            conv_cache = dict(conv_cache)
+            for opt in opts:
+                conv_cache.pop(opt, None)
+        self._data = data
+        self._interpolator = interpolator
+        self._conv_cache = conv_cache
+
+    def _invalidate(self, opts):
+        batches = self._batches
+        if batches:
+            batch = batches.get(_get_ident())
+            if batch is not None:
+                # the committed options are unchanged until the batch ends
+                batch.opts.update(opts)
+                if batch.interpolator is not None:
+                    batch.interpolator.invalidate(opts)
+                return
+        if self._interpolator is not None:
+            opts = self._interpolator.invalidate(opts)
+        conv_cache = self._conv_cache
+        if not conv_cache:
+            return
+        if len(opts) > len(conv_cache):
+            conv_cache.clear()
+        else:
+            for opt in opts:
+                conv_cache.pop(opt, None)
+
+
+def _immutable(value):
+    if type(value) in (tuple, frozenset):
+        return all(_immutable(x) for x in value)
+    return type(value) in _IMMUTABLE_TYPES
+
+
+def _cache_entry(value):
+    # cached values are shared between calls, other ones are converted
+    # every time
+    if _immutable(value):
+        return value
+    freeze = _FROZEN_FORMS.get(type(value))
+    if freeze is not None:
+        frozen = freeze(value)
+        if _immutable(frozen):
+            return _Frozen(frozen, type(value))
+    return _UNCACHED
+
+
+def _raw_tables(config):
+    # defaults and sections tables of stdlib parsers, None if the parser
+    # is another class or the tables are laid out differently
+    if type(config) not in _STDLIB_PARSERS:
+        return None
+    defaults = getattr(config, '_defaults', None)
+    sections = getattr(config, '_sections', None)
+    if isinstance(defaults, dict) and isinstance(sections, dict):
+        return defaults, sections
+    return None
+
+
+def _tell(fileobj):
+    try:
+        return fileobj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _view_constructor(cls, *args, **kwargs):
+    msg = '{} is created by slicing a config'.format(cls.__name__)
+    raise Error(msg)
+
+
+class PlainConfigView(PlainConfig):
+    """Read/write view of PlainConfig options under a prefix.
+
+    Options are not copied: every access is translated to the parent
+    config, so the view always reflects the current parent state.
+    Use materialize() to get a detached PlainConfig.
+    """
+
+    load = attach = aload = from_configparser = classmethod(
+        _view_constructor)
+
+    def __init__(self, parent, prefix):
+        if isinstance(parent, PlainConfigView):
+            prefix = parent._opt_prefix + prefix
+            parent = parent._parent
+        self._parent = parent
+        self._prefix = prefix
+        self._opt_prefix = prefix + '.'
+        self._strict = parent._strict
+        self._encoding = parent._encoding
+        self._parser = parent._parser
+
+    @property
+    def prefix(self):
+        return self._prefix
+
+    @property
+    def _data(self):
+        return DictStorage(dict(self.items()))
+
+    @property
+    def _stats(self):
+        return self._parent._stats
+
+    @property
+    def stats(self):
+        return self._parent.stats
+
+    @stats.setter
+    def stats(self, stats):
+        raise Error('stats are set on the parent config')
+
+    def materialize(self):
+        kwargs = {'strict': self._strict, 'encoding': self._encoding,
+                  'parser': self._parser}
+        config = PlainConfig(**kwargs)
+        config._data = self._data
+        return config
+
+    def update(self, data):
+        kwargs = {'strict': self._strict, 'encoding': self._encoding,
+                  'parser': self._parser}
+        config = PlainConfig(**kwargs)
+        config.update(data)
+        self._parent.update({self._opt_prefix + opt: val
+                             for opt, val in config.items()})
+
+    def get(self, opt, default=EMPTY_VALUE, conv=str, cache=True):
+        return self._parent.get(self._opt_prefix + opt, default, conv, cache)
+
+    def set(self, opt, value, conv=str):
+        return self._parent.set(self._opt_prefix + opt, value, conv)
+
+    def conv_cache_info(self):
+        return self._parent.conv_cache_info()
+
+    def sections(self):
+        return self._parent._data.sections(self._prefix)
+
+    def overlay(self, *overrides):
+        return self.materialize().overlay(*overrides)
+
+    @contextlib.contextmanager
+    def batch(self):
+        with self._parent.batch():
+            yield self
+
+    def dump(self, fileobj, prefix=None, sort=True):
+        if prefix is not None:
+            prefix = self._opt_prefix + prefix
+        return self._parent.dump(
+            fileobj, self._prefix if prefix is None else prefix, sort)
+
+    def fingerprint(self, prefix=None):
+        if prefix is not None:
+            prefix = self._opt_prefix + prefix
+        return self._parent.fingerprint(
+            self._prefix if prefix is None else prefix)
+
+    def items(self, prefix=None):
+        if prefix is not None:
+            prefix = self._opt_prefix + prefix
+        return self._parent.items(self._prefix if prefix is None else prefix)
+
+    def __repr__(self):
+        return '<{}: {:d} opts under {}>'.format(type(self).__name__,
+                                                 len(self), self._prefix)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._parent[self._opt_prefix + index.start:] = value
+            return value
+        return self.set(index, value)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            del self._parent[self._opt_prefix + index.start:]
+        else:
+            del self._parent[self._opt_prefix + index]
+
+    def __contains__(self, opt):
+        return self._opt_prefix + opt in self._parent
+
+    def __iter__(self):
+        skip = len(self._opt_prefix)
+        return (opt[skip:] for opt in self._parent._data.keys(self._prefix))
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __len__(self):
+        return self._parent._data.count(self._prefix)
+
+    def __copy__(self):
+        return type(self)(self._parent, self._prefix)
+
+    def __deepcopy__(self, memo):
+        return self.materialize()
+
+    def _set_prefix(self, prefix, value):
+        self._parent._set_prefix(self._opt_prefix + prefix, value)
+
+    def _delete_prefix(self, prefix):
+        self._parent._delete_prefix(self._opt_prefix + prefix)
+
+    def _merge(self, data):
+        prefix = self._opt_prefix
+        self._parent._merge({prefix + opt: val for opt, val in data.items()})
+
+    def _invalidate(self, opts):
+        prefix = self._opt_prefix
+        self._parent._invalidate([prefix + opt for opt in opts])
@@ -0,0 +1,155 @@
+# coding: utf-8
+
+import os
+import threading
+from collections import namedtuple
+
+from .parser import parse_path
+from .plain_config import PlainConfig
+
+try:
+    basestring
+except NameError:
+    basestring = unicode = str
+
+
+ConfigChanges = namedtuple('ConfigChanges', 'added, changed, removed')
+
+
+class _Source(object):
+
+    __slots__ = ('path', 'signature', 'data')
+
+    def __init__(self, path, signature, data):
+        self.path = path
+        self.signature = signature
+        self.data = data
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+    return mtime, stat.st_size, stat.st_ino, stat.st_dev
+
+
+class ReloadableConfig(PlainConfig):
+    """PlainConfig which can pick up changes of its source files.
+
+    Every update() source is remembered. reload() stats the source paths,
+    parses only the changed files and applies the resulting difference
+    to a copy-on-write copy of the options, which then replaces the
+    current options at once, so readers see either the old or the new
+    state. Options set directly on the config survive reloads unless the
+    reload changes them too. Copies reload their sources on their own and
+    start without subscribers.
+    """
+
+    def __init__(self, data=None, **kwargs):
+        self._sources = []
+        self._subscribers = []
+        self._reload_lock = threading.Lock()
+        super(ReloadableConfig, self).__init__(data, **kwargs)
+
+    def subscribe(self, callback, prefix=None):
+        """Call callback(changes) after reloads touching the prefix."""
+        self._subscribers.append((callback, prefix))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [x for x in self._subscribers
+                             if x[0] != callback]
+
+    def reload(self):
+        with self._reload_lock:
+            changed = []
+            for source in self._sources:
+                if source.path is not None:
+                    signature = _signature(source.path)
+                    if signature != source.signature:
+                        changed.append((source, signature))
+            if not changed:
+                return ConfigChanges(frozenset(), frozenset(), frozenset())
+
+            # parse everything before touching any state
+            parsed = [parse_path(source.path, self._encoding, self._strict,
+                                 self._parser) for source, _ in changed]
+            old = self._merged()
+            for (source, signature), data in zip(changed, parsed):
+                source.signature, source.data = signature, data
+            new = self._merged()
+
+            changes = ConfigChanges(
+                frozenset(opt for opt in new if opt not in old),
+                frozenset(opt for opt, val in new.items()
+                          if opt in old and old[opt] != val),
+                frozenset(opt for opt in old if opt not in new))
+            self._publish(changes, new)
+
+        for callback, prefix in list(self._subscribers):
+            filtered = changes
+            if prefix is not None:
+                filtered = ConfigChanges(*(_under(x, prefix) for x in changes))
+            if any(filtered):
+                callback(filtered)
+        return changes
+
+    def __copy__(self):
+        obj = super(ReloadableConfig, self).__copy__()
+        obj._sources = [_Source(x.path, x.signature, x.data)
+                        for x in self._sources]
+        obj._subscribers = []
+        obj._reload_lock = threading.Lock()
+        return obj
+
+    def __deepcopy__(self, memo):
+        memo[id(self._subscribers)] = []
+        memo[id(self._reload_lock)] = threading.Lock()
+        return super(ReloadableConfig, self).__deepcopy__(memo)
+
+    def _update(self, data):
+        if isinstance(data, basestring):
+            return self._update_parsed(data, self._parse_path(data))
+
+        kwargs = {'strict': self._strict, 'encoding': self._encoding,
+                  'parser': self._parser}
+        config = PlainConfig(**kwargs)
+        config.update(data)
+        self._update_parsed(None, _Source(None, None,
+                                          dict(config._data.items())))
+
+    def _parse_path(self, path):
+        # stat before parsing, so a change racing the parse is picked up
+        # by the next reload
+        signature = _signature(path)
+        data = {}
+        if signature is not None:
+            data = super(ReloadableConfig, self)._parse_path(path)
+        return _Source(path, signature, data)
+
+    def _update_parsed(self, path, source):
+        self._merge(source.data)
+        self._sources.append(source)
+
+    def _update_parallel(self, sources, jobs, processes=False):
+        for source in sources:
+            self.update(source)
+
+    def _merged(self):
+        data = {}
+        for source in self._sources:
+            data.update(source.data)
+        return data
+
+    def _publish(self, changes, new):
+        self._publish_layer(changes.removed,
+                            {opt: new[opt]
+                             for opt in changes.added | changes.changed},
+                            set().union(*changes))
+
+
+def _under(opts, prefix):
+    opt_prefix = prefix + '.'
+    return frozenset(opt for opt in opts
+                     if opt == prefix or opt.startswith(opt_prefix))
@@ -0,0 +1,111 @@
+# coding: utf-8
+
+import keyword
+import re
+
+from .exceptions import SchemaError
+
+
+_MISSING = object()
+
+
+class SchemaRecord(object):
+    """Base class of records built by Schema.record()."""
+
+    __slots__ = ()
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(x, getattr(self, x)) for x in self.__slots__))
+
+
+class Schema(object):
+    """Typed description of config options.
+
+    spec maps option names to converters or (converter, default) pairs.
+    Names ending with '.*' match every option under the prefix and give
+    dicts of converted values. The extraction plan is built once, so the
+    same schema can be cheaply applied to any number of (sub)configs.
+    """
+
+    _FIELD_CHARS = re.compile(r'\W')
+
+    def __init__(self, spec, name='Record'):
+        super(Schema, self).__init__()
+        self._plan = []
+        fields = []
+        cum_error = []
+
+        for opt, conv in sorted(spec.items()):
+            default = _MISSING
+            if isinstance(conv, tuple):
+                conv, default = conv
+
+            prefix = None
+            if opt.endswith('.*'):
+                prefix = opt = opt[:-2]
+
+            field = self._FIELD_CHARS.sub('_', opt)
+            if (not field or field[0].isdigit() or keyword.iskeyword(field) or
+                    field in fields):
+                cum_error.append('bad field name for option: {}'.format(opt))
+            fields.append(field)
+            self._plan.append((field, opt, prefix, conv, default))
+
+        if cum_error:
+            raise SchemaError('\n'.join(cum_error))
+        self._record_type = type(name, (SchemaRecord,),
+                                 {'__slots__': tuple(fields)})
+
+    @property
+    def fields(self):
+        return self._record_type.__slots__
+
+    def apply(self, config):
+        result = {}
+        cum_error = []
+        get = config.get
+
+        for field, opt, prefix, conv, default in self._plan:
+            try:
+                if prefix is None:
+                    value = get(opt, _MISSING, conv=conv)
+                else:
+                    # every result gets its own dict, even an empty one
+                    value = {sub: conv(val)
+                             for sub, val in config.items(prefix)}
+                    if not value and default is not _MISSING:
+                        value = default
+            except (TypeError, ValueError) as e:
+                cum_error.append('invalid option {}: {}'.format(opt, e))
+                continue
+
+            if value is _MISSING:
+                if default is _MISSING:
+                    cum_error.append('missing option: {}'.format(opt))
+                    continue
+                value = default
+            result[field] = value
+
+        if cum_error:
+            raise SchemaError('\n'.join(cum_error))
+        return result
+
+    def record(self, config):
+        record = self._record_type.__new__(self._record_type)
+        for field, value in self.apply(config).items():
+            setattr(record, field, value)
+        return record
+
+    def __repr__(self):
+        return '<{}: {:d} fields>'.format(type(self).__name__,
+                                          len(self._plan))
@@ -0,0 +1,99 @@
+# coding: utf-8
+
+import hashlib
+import io
+import logging
+import marshal
+import os
+import sys
+import tempfile
+
+from .parser import PARSERS
+
+
+logger = logging.getLogger('plain_config')
+
+MAGIC = 'yaconf-snapshot-1:{}.{}\n'.format(*sys.version_info[:2]).encode()
+SUFFIX = '.snapshot'
+
+
+def snapshot_path(path, cache_dir=None):
+    if cache_dir is None:
+        return path + SUFFIX
+    path = os.path.abspath(path).encode('utf-8')
+    return os.path.join(cache_dir, hashlib.sha1(path).hexdigest() + SUFFIX)
+
+
+def compile_snapshot(path, cache_dir=None, strict=True, encoding='utf-8',
+                     parser='fast'):
+    """Parse config file and store its options as binary snapshot.
+
+    Returns (snapshot path, options).
+    """
+    stat = os.stat(path)
+    with io.open(path, 'rb') as fileobj:
+        raw = fileobj.read()
+
+    with io.TextIOWrapper(io.BytesIO(raw), encoding=encoding) as fileobj:
+        data = PARSERS[parser](fileobj, strict)
+    data = {opt: data[opt] for opt in sorted(data)}
+
+    header = _header(stat, hashlib.sha1(raw).hexdigest(), strict, encoding)
+    dst = snapshot_path(path, cache_dir)
+    _write(dst, header, data)
+    return dst, data
+
+
+def load_snapshot(path, cache_dir=None, strict=True, encoding='utf-8',
+                  parser='fast'):
+    """Load options of config file from its snapshot.
+
+    The snapshot is used as is while size and mtime of the source match,
+    otherwise content hash is checked and the snapshot is rebuilt only if
+    the content was really changed. Options are returned sorted.
+    """
+    src = snapshot_path(path, cache_dir)
+    stat = os.stat(path)
+    try:
+        with io.open(src, 'rb') as fileobj:
+            if fileobj.read(len(MAGIC)) != MAGIC:
+                raise ValueError('bad magic')
+            header, data = marshal.loads(fileobj.read())
+    except (IOError, OSError, ValueError, EOFError, TypeError):
+        return compile_snapshot(path, cache_dir, strict, encoding, parser)[1]
+
+    if (header['strict'], header['encoding']) != (strict, encoding):
+        return compile_snapshot(path, cache_dir, strict, encoding, parser)[1]
+    if (header['size'], header['mtime']) == (stat.st_size, _mtime(stat)):
+        return data
+
+    with io.open(path, 'rb') as fileobj:
+        digest = hashlib.sha1(fileobj.read()).hexdigest()
+    if digest != header['sha1']:
+        return compile_snapshot(path, cache_dir, strict, encoding, parser)[1]
+
+    _write(src, _header(stat, digest, strict, encoding), data)
+    return data
+
+
+def _mtime(stat):
+    return getattr(stat, 'st_mtime_ns', stat.st_mtime)
+
+
+def _header(stat, digest, strict, encoding):
+    return {'size': stat.st_size, 'mtime': _mtime(stat), 'sha1': digest,
+            'strict': strict, 'encoding': encoding}
+
+
+def _write(path, header, data):
+    dirname = os.path.dirname(path) or '.'
+    try:
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fileobj:
+            fileobj.write(MAGIC)
+            fileobj.write(marshal.dumps((header, data)))
+        getattr(os, 'replace', os.rename)(tmp_path, path)
+    except (IOError, OSError) as e:
+        logger.warning('unable to write snapshot %s: %s', path, e)
@@ -0,0 +1,48 @@
+# coding: utf-8
+
+from collections import Counter, namedtuple
+
+
+SourceStats = namedtuple('SourceStats', 'source, seconds, size, options')
+
+
+class ConfigStats(object):
+    """Runtime statistics of PlainConfig.
+
+    Any object with on_parse(), on_read() and on_timing() methods can be
+    used as PlainConfig stats, so subclass this one or write your own to
+    export the events to a metrics pipeline.
+    """
+
+    def __init__(self):
+        super(ConfigStats, self).__init__()
+        self.sources = []
+        self.reads = Counter()
+        # operation: [calls, seconds]
+        self.timings = {}
+
+    def on_parse(self, source, seconds, size, options):
+        self.sources.append(SourceStats(source, seconds, size, options))
+
+    def on_read(self, opt):
+        self.reads[opt] += 1
+
+    def on_timing(self, op, seconds):
+        timing = self.timings.setdefault(op, [0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def hot_options(self, num=None):
+        return self.reads.most_common(num)
+
+    def as_dict(self):
+        return {
+            'sources': [x._asdict() for x in self.sources],
+            'reads': dict(self.reads),
+            'timings': {op: {'calls': calls, 'seconds': seconds}
+                        for op, (calls, seconds) in self.timings.items()},
+        }
+
+    def __repr__(self):
+        return '<{}: {:d} sources, {:d} reads>'.format(
+            type(self).__name__, len(self.sources), sum(self.reads.values()))
@@ -0,0 +1,732 @@
+# coding: utf-8
+
+import array
+import bisect
+import copy
+import heapq
+import mmap
+import struct
+import sys
+import zlib
+
+from .exceptions import Error
+
+
+_MISSING = object()
+_FINGERPRINT_MASK = (1 << 64) - 1
+
+
+class Storage(object):
+    """Read interface shared by option tables.
+
+    Subclasses provide lookups, sorted keys(prefix), count(prefix) and
+    sections(prefix); the rest is defined in terms of them.
+    """
+
+    readonly = True
+    # set once a LayeredStorage of another config uses the table as its
+    # base, the table must not be changed anymore
+    shared = False
+    # prefix: fingerprint, None is the key of the whole table
+    _fingerprints = None
+
+    def get(self, opt, default=None):
+        try:
+            return self[opt]
+        except KeyError:
+            return default
+
+    def fingerprint(self, prefix=None):
+        """Order independent hash of the options under the prefix.
+
+        Options are hashed relative to the prefix, so equal subtrees have
+        equal fingerprints wherever they are. Fingerprints are computed
+        on the first call and are valid within the current process only.
+        """
+        if self._fingerprints is None:
+            fingerprints = {}
+            for opt, value in self.items():
+                _fingerprint_add(fingerprints, opt, value)
+            self._fingerprints = fingerprints
+        return self._fingerprints.get(prefix, 0)
+
+    def items(self, prefix=None):
+        return ((opt, self[opt]) for opt in self.keys(prefix))
+
+    def update(self, data):
+        raise Error('read-only options')
+
+    def delete(self, opts):
+        raise Error('read-only options')
+
+    def delete_prefix(self, prefix):
+        raise Error('read-only options')
+
+    def __setitem__(self, opt, value):
+        raise Error('read-only options')
+
+    def __delitem__(self, opt):
+        raise Error('read-only options')
+
+    def __eq__(self, other):
+        if not isinstance(other, Storage):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        # items() of every storage are sorted by option
+        return all(x == y for x, y in zip(self.items(), other.items()))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return '<{}: {:d} opts>'.format(type(self).__name__, len(self))
+
+    def _fingerprint_update(self, fingerprints, data):
+        # has to be called before the options are changed
+        for opt in data:
+            old = self.get(opt, _MISSING)
+            if old is not _MISSING:
+                _fingerprint_add(fingerprints, opt, old, -1)
+            _fingerprint_add(fingerprints, opt, data[opt])
+
+
+def _fingerprint_add(fingerprints, opt, value, sign=1):
+    prefix, suffix, pos = None, opt, -1
+    while True:
+        _fingerprint_add_raw(fingerprints, prefix,
+                             sign * hash((suffix, value)))
+        pos = opt.find('.', pos + 1)
+        if pos < 0:
+            break
+        prefix, suffix = opt[:pos], opt[pos + 1:]
+
+
+def _fingerprint_add_raw(fingerprints, prefix, value):
+    # options sum up to the fingerprints of all their parent prefixes
+    fingerprint = (fingerprints.get(prefix, 0) + value) & _FINGERPRINT_MASK
+    if fingerprint:
+        fingerprints[prefix] = fingerprint
+    else:
+        fingerprints.pop(prefix, None)
+
+
+class DictStorage(Storage):
+    """Option table with a sorted key index.
+
+    Values live in a plain dict, option names are additionally kept in a
+    sorted list, so prefix lookups, section listing and subtree deletes
+    are done by binary search instead of full scans.
+    """
+
+    readonly = False
+    # bulk updates with more new options than this re-sort the index
+    # instead of inserting the options one by one
+    _INSORT_LIMIT = 16
+
+    def __init__(self, data=None):
+        super(DictStorage, self).__init__()
+        self._dict = {}
+        self._keys = []
+
+        if data is not None:
+            self.update(data)
+
+    @classmethod
+    def from_sorted(cls, data):
+        """Take ownership of a dict which keys are inserted sorted."""
+        obj = cls()
+        obj._dict = data
+        obj._keys = list(data)
+        return obj
+
+    def get(self, opt, default=None):
+        return self._dict.get(opt, default)
+
+    def keys(self, prefix=None):
+        if prefix is None:
+            return iter(list(self._keys))
+        lo, hi = self._range(prefix)
+        return iter(self._keys[lo:hi])
+
+    def items(self, prefix=None):
+        keys = list(self._keys) if prefix is None else self._keys[slice(
+            *self._range(prefix))]
+        return zip(keys, map(self._dict.__getitem__, keys))
+
+    def count(self, prefix):
+        lo, hi = self._range(prefix)
+        return hi - lo
+
+    def sections(self, prefix=None):
+        keys = self._keys
+        idx, end, skip = 0, len(keys), 0
+        if prefix is not None:
+            idx, end = self._range(prefix)
+            skip = len(prefix) + 1
+
+        while idx < end:
+            opt = keys[idx]
+            pos = opt.find('.', skip)
+            if pos < 0:
+                idx += 1
+                continue
+            yield opt[skip:pos]
+            idx = bisect.bisect_left(keys, opt[:pos] + '/', idx, end)
+
+    def update(self, data):
+        if isinstance(data, DictStorage):
+            data = data._dict
+        if self._fingerprints is not None:
+            self._fingerprint_update(self._fingerprints, data)
+        new_opts = [opt for opt in data if opt not in self._dict]
+        self._dict.update(data)
+
+        if len(new_opts) > self._INSORT_LIMIT:
+            self._keys.extend(new_opts)
+            self._keys.sort()
+        else:
+            for opt in new_opts:
+                bisect.insort(self._keys, opt)
+
+    def delete(self, opts):
+        opts = list(opts)
+        fingerprints = self._fingerprints
+        for opt in opts:
+            value = self._dict.pop(opt)
+            if fingerprints is not None:
+                _fingerprint_add(fingerprints, opt, value, -1)
+
+        if len(opts) > self._INSORT_LIMIT:
+            self._keys = [opt for opt in self._keys if opt in self._dict]
+        else:
+            for opt in opts:
+                del self._keys[bisect.bisect_left(self._keys, opt)]
+
+    def delete_prefix(self, prefix):
+        lo, hi = self._range(prefix)
+        del_opts = self._keys[lo:hi]
+        fingerprints = self._fingerprints
+        for opt in del_opts:
+            if fingerprints is not None:
+                _fingerprint_add(fingerprints, opt, self._dict[opt], -1)
+            del self._dict[opt]
+        del self._keys[lo:hi]
+        return del_opts
+
+    def copy(self):
+        obj = type(self)()
+        obj._dict = self._dict.copy()
+        obj._keys = list(self._keys)
+        if self._fingerprints is not None:
+            obj._fingerprints = self._fingerprints.copy()
+        return obj
+
+    def _range(self, prefix):
+        # every option of the subtree sorts between 'prefix.' and 'prefix/'
+        lo = bisect.bisect_left(self._keys, prefix + '.')
+        hi = bisect.bisect_left(self._keys, prefix + '/', lo)
+        return lo, hi
+
+    def __getitem__(self, opt):
+        return self._dict[opt]
+
+    def __setitem__(self, opt, value):
+        if self._fingerprints is not None:
+            self._fingerprint_update(self._fingerprints, {opt: value})
+        if opt not in self._dict:
+            bisect.insort(self._keys, opt)
+        self._dict[opt] = value
+
+    def __delitem__(self, opt):
+        value = self._dict.pop(opt)
+        del self._keys[bisect.bisect_left(self._keys, opt)]
+        if self._fingerprints is not None:
+            _fingerprint_add(self._fingerprints, opt, value, -1)
+
+    def __contains__(self, opt):
+        return opt in self._dict
+
+    def __iter__(self):
+        return iter(self._dict)
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __eq__(self, other):
+        if isinstance(other, DictStorage):
+            return self._dict == other._dict
+        return super(DictStorage, self).__eq__(other)
+
+
+class LayeredStorage(Storage):
+    """Writable layer on top of a storage which is never modified.
+
+    Writes go to the top DictStorage, deleted options of the base are
+    remembered as tombstones in another sorted DictStorage, so creating
+    a layer costs O(1), every change costs only the size of the change
+    and prefix queries stay bounded by the prefix. merged() turns a layer
+    which outgrew its base into a plain DictStorage.
+    """
+
+    readonly = False
+    # merged() keeps layers with fewer changes than this or an eighth of
+    # the base
+    _MERGE_MIN = 1024
+
+    def __init__(self, base):
+        super(LayeredStorage, self).__init__()
+        self._base = base
+        self._top = DictStorage()
+        # deleted option: None
+        self._deleted = DictStorage()
+        # number of top options missing in the base
+        self._extra = 0
+        # difference from the base fingerprints, None until requested
+        self._fingerprint_delta = None
+
+    def fingerprint(self, prefix=None):
+        delta = self._fingerprint_delta
+        if delta is None:
+            delta = {}
+            base = self._base
+            for opt, value in self._top.items():
+                old = base.get(opt, _MISSING)
+                if old is not _MISSING:
+                    _fingerprint_add(delta, opt, old, -1)
+                _fingerprint_add(delta, opt, value)
+            for opt in self._deleted:
+                _fingerprint_add(delta, opt, base[opt], -1)
+            self._fingerprint_delta = delta
+        return (self._base.fingerprint(prefix) +
+                delta.get(prefix, 0)) & _FINGERPRINT_MASK
+
+    def merged(self):
+        """Return self, or equal DictStorage if the layer outgrew its base.
+
+        Layers over read-only tables are kept, the tables are usually
+        attached files.
+        """
+        changes = len(self._top) + len(self._deleted)
+        if (self._base.readonly or
+                changes <= max(self._MERGE_MIN, len(self._base) >> 3)):
+            return self
+        obj = DictStorage.from_sorted(dict(self.items()))
+        if self._fingerprint_delta is not None:
+            obj._fingerprints = self._merged_fingerprints()
+        return obj
+
+    def _merged_fingerprints(self):
+        # the table replacing the layer takes over maintained fingerprints
+        self.fingerprint()
+        fingerprints = self._base._fingerprints.copy()
+        for prefix, fingerprint in self._fingerprint_delta.items():
+            _fingerprint_add_raw(fingerprints, prefix, fingerprint)
+        return fingerprints
+
+    def keys(self, prefix=None):
+        base_keys = self._base.keys(prefix)
+        if self._deleted:
+            deleted = self._deleted._dict
+            base_keys = (opt for opt in base_keys if opt not in deleted)
+
+        last = None
+        for opt in heapq.merge(self._top.keys(prefix), base_keys):
+            if opt != last:
+                last = opt
+                yield opt
+
+    def count(self, prefix):
+        base = self._base
+        extra = sum(1 for opt in self._top.keys(prefix) if opt not in base)
+        return base.count(prefix) - self._deleted.count(prefix) + extra
+
+    def sections(self, prefix=None):
+        base, deleted = self._base, self._deleted
+        top_sections = set(self._top.sections(prefix))
+        opt_prefix = '' if prefix is None else prefix + '.'
+
+        last = None
+        for section in heapq.merge(self._top.sections(prefix),
+                                   base.sections(prefix),
+                                   key=lambda x: x + '.'):
+            if section == last:
+                continue
+            last = section
+            # tombstones are base options, so counts tell whether any
+            # base option of the section survived
+            if (section in top_sections or not deleted or
+                    base.count(opt_prefix + section) >
+                    deleted.count(opt_prefix + section)):
+                yield section
+
+    def update(self, data):
+        top, base = self._top._dict, self._base
+        deleted = self._deleted._dict
+        if self._fingerprint_delta is not None:
+            self._fingerprint_update(self._fingerprint_delta, data)
+        revived = []
+        for opt in data:
+            if opt not in top:
+                if opt in deleted:
+                    revived.append(opt)
+                elif opt not in base:
+                    self._extra += 1
+        if revived:
+            self._deleted.delete(revived)
+        self._top.update(data)
+
+    def delete(self, opts):
+        for opt in opts:
+            del self[opt]
+
+    def delete_prefix(self, prefix):
+        delta = self._fingerprint_delta
+        if delta is None:
+            del_opts = list(self.keys(prefix))
+        else:
+            del_opts = []
+            for opt, value in self.items(prefix):
+                _fingerprint_add(delta, opt, value, -1)
+                del_opts.append(opt)
+        for opt in self._top.delete_prefix(prefix):
+            if opt not in self._base:
+                self._extra -= 1
+        self._deleted.update(dict.fromkeys(self._base.keys(prefix)))
+        return del_opts
+
+    def items(self, prefix=None):
+        base_items = self._base.items(prefix)
+        if self._deleted:
+            deleted = self._deleted._dict
+            base_items = (x for x in base_items if x[0] not in deleted)
+
+        # top options go first on equal names and hide the base ones
+        last = _MISSING
+        for opt, _, value in heapq.merge(
+                ((opt, 0, value) for opt, value in self._top.items(prefix)),
+                ((opt, 1, value) for opt, value in base_items)):
+            if opt != last:
+                last = opt
+                yield opt, value
+
+    def copy(self):
+        obj = copy.copy(self)
+        obj._top = self._top.copy()
+        obj._deleted = self._deleted.copy()
+        obj._extra = self._extra
+        obj.shared = False
+        if self._fingerprint_delta is not None:
+            obj._fingerprint_delta = self._fingerprint_delta.copy()
+        return obj
+
+    def get(self, opt, default=None):
+        top = self._top._dict
+        if opt in top:
+            return top[opt]
+        if opt in self._deleted._dict:
+            return default
+        return self._base.get(opt, default)
+
+    def __getitem__(self, opt):
+        top = self._top._dict
+        if opt in top:
+            return top[opt]
+        if opt in self._deleted._dict:
+            raise KeyError(opt)
+        return self._base[opt]
+
+    def __setitem__(self, opt, value):
+        if self._fingerprint_delta is not None:
+            self._fingerprint_update(self._fingerprint_delta, {opt: value})
+        if opt not in self._top._dict:
+            if opt in self._deleted._dict:
+                del self._deleted[opt]
+            elif opt not in self._base:
+                self._extra += 1
+        self._top[opt] = value
+
+    def __delitem__(self, opt):
+        if self._fingerprint_delta is not None and opt in self:
+            _fingerprint_add(self._fingerprint_delta, opt, self[opt], -1)
+        if opt in self._top._dict:
+            del self._top[opt]
+            if opt in self._base:
+                self._deleted[opt] = None
+            else:
+                self._extra -= 1
+        elif opt in self._base and opt not in self._deleted._dict:
+            self._deleted[opt] = None
+        else:
+            raise KeyError(opt)
+
+    def __contains__(self, opt):
+        return opt in self._top._dict or (opt not in self._deleted._dict and
+                                          opt in self._base)
+
+    def __iter__(self):
+        base, deleted = self._base, self._deleted._dict
+        for opt in base:
+            if opt not in deleted:
+                yield opt
+        for opt in self._top:
+            if opt not in base:
+                yield opt
+
+    def __len__(self):
+        return len(self._base) - len(self._deleted) + self._extra
+
+
+class CompactTable(Storage):
+    """Read-only sorted option table packed into a single buffer.
+
+    Options and values are stored as utf-8 strings one after another,
+    their bounds are kept in arrays of offsets, so an option costs about
+    its text length plus 24 bytes instead of two str objects and a dict
+    entry. Exact lookups bisect a sorted array of option crc32 hashes,
+    prefix lookups are binary searches over the sorted options.
+    """
+
+    _ENCODING = 'utf-8'
+    _ERRORS = 'surrogatepass'
+
+    # magic, version, byte order, count and positions of the key offsets,
+    # value offsets, hashes, order and the text buffer
+    _HEADER = struct.Struct('<8sBB6xQQQQQQ')
+    _MAGIC = b'YACONFMM'
+    _VERSION = 1
+
+    def __init__(self, buf=b'', key_offsets=None, value_offsets=None,
+                 hashes=None, order=None):
+        super(CompactTable, self).__init__()
+        if key_offsets is None:
+            key_offsets = array.array('Q', [0])
+        if value_offsets is None:
+            value_offsets = array.array('Q', [len(buf)])
+        self._buf = buf
+        self._key_off = key_offsets
+        self._value_off = value_offsets
+        self._size = len(self._key_off) - 1
+
+        if hashes is None or order is None:
+            hashes, order = self._build_index()
+        self._hashes = hashes
+        self._order = order
+
+    @classmethod
+    def from_items(cls, items):
+        """Build table from (option, value) pairs sorted by option.
+
+        Values which are not strings are stored as str() of them, the way
+        get() returns them.
+        """
+        encoding, errors = cls._ENCODING, cls._ERRORS
+        keys, values = [], []
+        for opt, value in items:
+            if not isinstance(value, str):
+                value = str(value)
+            keys.append(opt.encode(encoding, errors))
+            values.append(value.encode(encoding, errors))
+
+        key_off = array.array('Q', [0])
+        pos = 0
+        for key in keys:
+            pos += len(key)
+            key_off.append(pos)
+        value_off = array.array('Q', [pos])
+        for value in values:
+            pos += len(value)
+            value_off.append(pos)
+        return cls(b''.join(keys) + b''.join(values), key_off, value_off)
+
+    @classmethod
+    def attach(cls, path):
+        """Map table file written by dump() without reading it."""
+        with open(path, 'rb') as fileobj:
+            buf = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = cls._HEADER.unpack_from(buf)
+        magic, version, big_endian, size = header[:4]
+        if (magic, version) != (cls._MAGIC, cls._VERSION):
+            raise Error('not an options table: {}'.format(path))
+        if big_endian != (sys.byteorder == 'big'):
+            raise Error('options table of other byte order: {}'.format(path))
+
+        view = memoryview(buf)
+        key_pos, value_pos, hashes_pos, order_pos = header[4:8]
+        return cls(buf,
+                   view[key_pos:value_pos].cast('Q'),
+                   view[value_pos:hashes_pos].cast('Q'),
+                   view[hashes_pos:hashes_pos + 4 * size].cast('I'),
+                   view[order_pos:order_pos + 4 * size].cast('I'))
+
+    def dump(self, fileobj):
+        size = self._size
+        key_pos = self._HEADER.size
+        value_pos = key_pos + 8 * (size + 1)
+        hashes_pos = value_pos + 8 * (size + 1)
+        order_pos = hashes_pos + 4 * size
+        # offsets of the written text are absolute positions in the file
+        buf_pos = (order_pos + 4 * size + 7) // 8 * 8
+        shift = buf_pos - self._key_off[0]
+
+        fileobj.write(self._HEADER.pack(
+            self._MAGIC, self._VERSION, sys.byteorder == 'big', size,
+            key_pos, value_pos, hashes_pos, order_pos, buf_pos))
+        for offsets in (self._key_off, self._value_off):
+            fileobj.write(array.array('Q', (x + shift for x in offsets)))
+        fileobj.write(array.array('I', self._hashes))
+        fileobj.write(array.array('I', self._order))
+        fileobj.write(b'\0' * (buf_pos - order_pos - 4 * size))
+        fileobj.write(self._buf[self._key_off[0]:self._value_off[size]])
+
+    def keys(self, prefix=None):
+        lo, hi = (0, self._size) if prefix is None else self._range(prefix)
+        return (self._key(idx) for idx in range(lo, hi))
+
+    def items(self, prefix=None):
+        lo, hi = (0, self._size) if prefix is None else self._range(prefix)
+        return ((self._key(idx), self._value(idx)) for idx in range(lo, hi))
+
+    def count(self, prefix):
+        lo, hi = self._range(prefix)
+        return hi - lo
+
+    def sections(self, prefix=None):
+        idx, end, skip = 0, self._size, 0
+        if prefix is not None:
+            idx, end = self._range(prefix)
+            skip = len(prefix) + 1
+
+        while idx < end:
+            opt = self._key(idx)
+            pos = opt.find('.', skip)
+            if pos < 0:
+                idx += 1
+                continue
+            yield opt[skip:pos]
+            idx = self._bisect(opt[:pos] + '/', idx, end)
+
+    def get(self, opt, default=None):
+        idx = self._find(opt)
+        return default if idx < 0 else self._value(idx)
+
+    def _build_index(self):
+        crc32 = zlib.crc32
+        hashes = [crc32(self._key_bytes(idx)) for idx in range(self._size)]
+        order = sorted(range(self._size), key=hashes.__getitem__)
+        return (array.array('I', [hashes[idx] for idx in order]),
+                array.array('I', order))
+
+    def _key_bytes(self, idx):
+        return self._buf[self._key_off[idx]:self._key_off[idx + 1]]
+
+    def _key(self, idx):
+        return self._key_bytes(idx).decode(self._ENCODING, self._ERRORS)
+
+    def _value(self, idx):
+        value = self._buf[self._value_off[idx]:self._value_off[idx + 1]]
+        return value.decode(self._ENCODING, self._ERRORS)
+
+    def _bisect(self, opt, lo=0, hi=None):
+        key = opt.encode(self._ENCODING, self._ERRORS)
+        hi = self._size if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(self, opt):
+        key = opt.encode(self._ENCODING, self._ERRORS)
+        key_hash = zlib.crc32(key)
+        hashes = self._hashes
+        pos = bisect.bisect_left(hashes, key_hash)
+        while pos < self._size and hashes[pos] == key_hash:
+            idx = self._order[pos]
+            if self._key_bytes(idx) == key:
+                return idx
+            pos += 1
+        return -1
+
+    def _range(self, prefix):
+        lo = self._bisect(prefix + '.')
+        return lo, self._bisect(prefix + '/', lo)
+
+    def __getitem__(self, opt):
+        idx = self._find(opt)
+        if idx < 0:
+            raise KeyError(opt)
+        return self._value(idx)
+
+    def __contains__(self, opt):
+        return self._find(opt) >= 0
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return self._size
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class CompactStorage(LayeredStorage):
+    """Writable storage backed by CompactTable.
+
+    Changes are collected in the top layer and merged into a new table
+    when they grow beyond a quarter of the table.
+    """
+
+    _COMPACT_MIN = 1024
+
+    def __init__(self, data=None):
+        super(CompactStorage, self).__init__(CompactTable())
+        if data is not None:
+            self.update(data)
+
+    def compact(self):
+        table = CompactTable.from_items(self.items())
+        delta = self._fingerprint_delta
+        if delta is not None:
+            table._fingerprints = self._merged_fingerprints()
+            delta = {}
+
+        self._base = table
+        self._top = DictStorage()
+        self._deleted = DictStorage()
+        self._extra = 0
+        self._fingerprint_delta = delta
+
+    def update(self, data):
+        super(CompactStorage, self).update(data)
+        self._maybe_compact()
+
+    def delete_prefix(self, prefix):
+        del_opts = super(CompactStorage, self).delete_prefix(prefix)
+        self._maybe_compact()
+        return del_opts
+
+    def merged(self):
+        # compacted in place instead
+        return self
+
+    def _maybe_compact(self):
+        changes = len(self._top) + len(self._deleted)
+        if changes > max(self._COMPACT_MIN, len(self._base) // 4):
+            self.compact()
+
+    def __setitem__(self, opt, value):
+        super(CompactStorage, self).__setitem__(opt, value)
+        self._maybe_compact()
+
+    def __delitem__(self, opt):
+        super(CompactStorage, self).__delitem__(opt)
+        self._maybe_compact()
+
+
+STORAGES = {'dict': DictStorage, 'compact': CompactStorage}
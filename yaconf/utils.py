@@ -1,5 +1,7 @@
 # coding: utf-8
 
+import array
+
 
 try:
     basestring
@@ -12,10 +14,13 @@ YES_NO = 'yes no'
 TRUE_FALSE = 'true false'
 ONE_ZERO = '1 0'
 
+_FALSE_STRINGS = frozenset(('off', 'no', 'false', '0'))
+_INT_TYPECODES = frozenset('bBhHiIlLqQ')
+
 
 def str2bool(string):
     if isinstance(string, basestring):
-        if string.lower() in ('off', 'no', 'false', '0'):
+        if string.lower() in _FALSE_STRINGS:
             return False
         return True
     raise ValueError('illegal string value: {}'.format(string))
@@ -34,3 +39,44 @@ def str2iter(string, container=list, conv=None):
     if conv is None:
         return container(string.split())
     return container(map(conv, string.split()))
+
+
+def str2array(string, typecode='d'):
+    """Convert list value to compact array.array of numbers.
+
+    Values are split like in str2iter(), but go straight to a typed buffer
+    instead of a list of Python numbers.
+    """
+    conv = int if typecode in _INT_TYPECODES else float
+    # array.array() fills faster from a list than from an iterator
+    return array.array(typecode,
+                       list(map(conv, string.replace(',', '').split())))
+
+
+def str2ndarray(string, dtype=float):
+    """Convert list value to NumPy array, NumPy has to be installed."""
+    import numpy
+    return numpy.array(string.replace(',', '').split()).astype(dtype)
+
+
+def prefix2array(config, prefix, typecode='d'):
+    """Convert options under the prefix to one array.array of numbers.
+
+    Every option has to hold a single number, values are converted
+    straight into the array. Returns (options, values) where options are
+    names relative to the prefix sorted like items(). numpy.asarray()
+    wraps the values without a copy.
+    """
+    items = list(config.items(prefix))
+    conv = int if typecode in _INT_TYPECODES else float
+    try:
+        values = array.array(typecode, [conv(value) for _, value in items])
+    except ValueError:
+        for opt, value in items:
+            try:
+                conv(value)
+            except ValueError:
+                msg = 'option {}.{} is not a single number: {}'
+                raise ValueError(msg.format(prefix, opt, value))
+        raise
+    return [opt for opt, _ in items], values